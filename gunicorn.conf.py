@@ -0,0 +1,38 @@
+"""
+gunicorn settings: gunicorn -c gunicorn.conf.py toyproject.asgi:application
+
+Workers are uvicorn's ASGI workers, so the drawing status event streams
+don't each hold a worker (see "Running under ASGI" in the README).
+
+The app is imported once in the master (preload_app), which warms it up
+(toys/warmup.py), so workers fork with templates compiled, URL patterns
+resolved and content types cached, and share those pages copy-on-write.
+Each worker logs how long it took from fork to being ready; the app itself
+logs each process's time from warm-up to first response.
+"""
+import multiprocessing
+import os
+import time
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master once the preloaded app is imported and warmed up, before any worker is forked
+    from django.db import connections
+    from toys import warmup
+    if warmup.is_warm():
+        server.log.info("App warmed up in %.0f ms", warmup.warmed_up_in * 1000)
+    # Never hand an open database connection to forked workers
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s ready %.1f ms after fork", worker.pid, (time.perf_counter() - worker.forked_at) * 1000)
@@ -0,0 +1,54 @@
+// Adds items through the JSON cart API instead of following the add-to-cart
+// links: the toy and every ticked accessory go in a single request, and the
+// page stays put. Network failures are retried with the same Idempotency-Key,
+// so a request that did reach the server is not applied twice.
+function csrfToken() {
+    const input = document.querySelector('[name="csrfmiddlewaretoken"]');
+    if (input) {
+        return input.value;
+    }
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? match[1] : '';
+}
+
+async function sendCartOperations(url, operations) {
+    const key = crypto.randomUUID();
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken(), 'Idempotency-Key': key},
+                body: JSON.stringify({operations: operations}),
+            });
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error);
+            }
+            return result;
+        } catch (error) {
+            if (!(error instanceof TypeError) || attempt >= 2) {
+                throw error;
+            }
+        }
+    }
+}
+
+document.querySelectorAll('a[data-cart-add]').forEach(function (link) {
+    link.addEventListener('click', async function (event) {
+        event.preventDefault();
+        const operations = [{op: 'add', type: link.dataset.type, id: Number(link.dataset.id)}];
+        if (link.dataset.type === 'toy') {
+            document.querySelectorAll('.cart-accessory:checked').forEach(function (checkbox) {
+                operations.push({op: 'add', type: 'accessory', id: Number(checkbox.value)});
+                checkbox.checked = false;
+            });
+        }
+        const status = document.querySelector('.cart-status');
+        try {
+            const result = await sendCartOperations(link.dataset.cartAdd, operations);
+            status.textContent = `Added to cart. ${result.item_count} item(s), total $${result.total_price}.`;
+        } catch (error) {
+            status.textContent = error.message;
+        }
+    });
+});
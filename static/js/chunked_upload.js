@@ -0,0 +1,65 @@
+// Sends the drawing image in resumable chunks before the form is submitted.
+// The upload ID is kept in localStorage, so after a dropped connection or a
+// page reload the same file resumes from the last byte the server received.
+async function sendInChunks(startUrl, file, csrfToken) {
+    const key = 'chunked-upload:' + [file.name, file.size, file.lastModified].join(':');
+    let status = null;
+
+    const savedId = localStorage.getItem(key);
+    if (savedId) {
+        const response = await fetch(startUrl + savedId + '/');
+        if (response.ok) {
+            status = await response.json();
+        }
+    }
+    if (!status) {
+        const body = new FormData();
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        const response = await fetch(startUrl, {method: 'POST', headers: {'X-CSRFToken': csrfToken}, body: body});
+        status = await response.json();
+        if (!response.ok) {
+            throw new Error(status.error);
+        }
+        localStorage.setItem(key, status.upload_id);
+    }
+
+    let offset = status.offset;
+    while (offset < file.size) {
+        const end = Math.min(offset + status.chunk_size, file.size);
+        const response = await fetch(startUrl + status.upload_id + '/', {
+            method: 'PUT',
+            headers: {'X-CSRFToken': csrfToken, 'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`},
+            body: file.slice(offset, end),
+        });
+        const result = await response.json();
+        if (!response.ok && (response.status !== 409 || result.offset === offset)) {
+            localStorage.removeItem(key);
+            throw new Error(result.error);
+        }
+        offset = result.offset;
+    }
+
+    localStorage.removeItem(key);
+    return status.upload_id;
+}
+
+document.querySelectorAll('form[data-chunked-upload]').forEach(function (form) {
+    form.addEventListener('submit', async function (event) {
+        const input = form.querySelector('input[type="file"][name="image"]');
+        if (!input || !input.files.length) {
+            return;
+        }
+        event.preventDefault();
+        const csrfToken = form.querySelector('[name="csrfmiddlewaretoken"]').value;
+        try {
+            form.querySelector('[name="upload_id"]').value = await sendInChunks(
+                form.dataset.chunkedUpload, input.files[0], csrfToken);
+        } catch (error) {
+            alert(error.message);
+            return;
+        }
+        input.value = '';
+        form.requestSubmit(event.submitter);
+    });
+});
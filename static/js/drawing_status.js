@@ -0,0 +1,12 @@
+// Live drawing status on the track drawings page: listens to the status
+// change stream and updates the affected drawing in place.
+document.querySelectorAll('[data-status-events]').forEach(function (list) {
+    const events = new EventSource(list.dataset.statusEvents);
+    events.onmessage = function (event) {
+        const change = JSON.parse(event.data);
+        const status = list.querySelector(`[data-drawing-id="${change.drawing}"] .drawing-status`);
+        if (status) {
+            status.textContent = change.status_display;
+        }
+    };
+});
@@ -0,0 +1,37 @@
+// Live drawing price preview: asks /api/quote/ for the price whenever the
+// width or height changes, instead of re-posting the whole form.
+document.querySelectorAll('[data-price-quote]').forEach(function (output) {
+    const form = output.closest('form');
+    const width = form.querySelector('[name="width"]');
+    const height = form.querySelector('[name="height"]');
+    let pending = null;
+
+    async function update() {
+        if (pending) {
+            pending.abort();
+        }
+        if (!(width.value > 0 && height.value > 0)) {
+            return;
+        }
+        pending = new AbortController();
+        const params = new URLSearchParams({width: width.value, height: height.value});
+        if (output.dataset.basePrice) {
+            params.set('base_price', output.dataset.basePrice);
+        }
+        try {
+            const response = await fetch(output.dataset.priceQuote + '?' + params, {signal: pending.signal});
+            const result = await response.json();
+            if (response.ok) {
+                output.textContent = 'Current Price: $' + result.quotes[0].price;
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                throw error;
+            }
+        }
+    }
+
+    width.addEventListener('input', update);
+    height.addEventListener('input', update);
+    update();
+});
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'toys.middleware.WarmUpMiddleware',  # warms the process up when the application is created
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'toys.middleware.GuestCartMiddleware',
 ]
 
 ROOT_URLCONF = 'toyproject.urls'
@@ -69,16 +71,131 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'toyproject.wsgi.application'
+ASGI_APPLICATION = 'toyproject.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite connection profiles for the toys.sqlite backend (toys/sqlite/base.py),
+# chosen with SQLITE_PROFILE. 'tuned' is for single-node deployments with
+# concurrent writers: WAL lets reads run during a write, BEGIN IMMEDIATE makes
+# writers queue on busy_timeout instead of failing with "database is locked".
+# 'default' is stock SQLite, kept for comparison (manage.py benchmark_cart_writes).
+SQLITE_PROFILES = {
+    'default': {
+        'pragmas': {'journal_mode': 'DELETE'},  # WAL persists in the file until switched back
+    },
+    'tuned': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',  # fsync at checkpoints only; a crash can lose the last commits, not corrupt
+            'busy_timeout': 5000,  # ms a writer waits for the lock
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,  # KiB per connection
+        },
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'tuned')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'toys.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_PROFILES[SQLITE_PROFILE],
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Seconds between WAL checkpoints run by manage.py checkpoint_sqlite
+SQLITE_CHECKPOINT_SECONDS = 30
+
+
+# One cache shared by every worker: Redis when REDIS_URL is set, otherwise a
+# file-based cache on local disk, which works for a single host.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
     }
+
+# Tests run against an in-memory cache instead (toys/test_runner.py)
+TEST_RUNNER = 'toys.test_runner.TestRunner'
+
+# Toys, accessories and review summaries are also kept in a per-process LRU of
+# this many objects (see toys/catalog_cache.py); other workers drop changed
+# entries within CATALOG_SYNC_SECONDS.
+CATALOG_LOCAL_CACHE_SIZE = 2000
+CATALOG_SYNC_SECONDS = 2
+CATALOG_CACHE_SECONDS = 3600
+
+# Sessions are read from the cache and written through to the database, and
+# the auth backend caches a snapshot of the user row, so requests from
+# logged-in users make no session or auth_user queries on a warm cache.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+AUTHENTICATION_BACKENDS = [
+    'toys.auth.CachedModelBackend',
+    # Still loads the users of sessions logged in before the cached backend was added
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USER_CACHE_SECONDS = 300
+
+# The homepage shows only the newest reviews; the rendered block is cached and
+# dropped whenever a HomepageReview is saved or deleted.
+HOMEPAGE_REVIEW_COUNT = 12
+HOMEPAGE_REVIEWS_CACHE_SECONDS = 3600
+
+# Anonymous visitors keep their cart in a signed cookie, merged into the
+# database cart when they log in, so guest browsing writes nothing.
+GUEST_CART_COOKIE_NAME = 'cart'
+GUEST_CART_COOKIE_AGE = 60 * 60 * 24 * 30
+GUEST_CART_MAX_LINES = 30
+
+CART_MAX_QUANTITY = 99
+CART_API_MAX_OPERATIONS = 50
+CART_REQUEST_KEY_EXPIRY_HOURS = 24
+
+# rollup_sales recomputes this many days before the last rollup, to pick up late payments
+SALES_ROLLUP_LOOKBACK_DAYS = 3
+
+# Rows fetched per round trip by the streaming admin/command exports
+EXPORT_CHUNK_SIZE = 2000
+
+# "Customers also bought": neighbours kept per item by build_recommendations,
+# the fewest shared baskets that count, and how many are shown on a page
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_MIN_COUNT = 2
+RECOMMENDATIONS_SHOWN = 4
+
+# Upper bounds of the toy_list price bands, in dollars; the last band is open-ended
+TOY_PRICE_BANDS = [10, 25, 50, 100]
+# Each process also rebuilds its facet index this often, in case a change was
+# made without signals (queryset.update(), raw SQL) and never published
+FACET_INDEX_SECONDS = 600
+
+# Token buckets for expensive endpoints (see toys/ratelimit.py): `burst`
+# requests at once, refilled at `rate`, per user or per IP for anonymous
+# visitors. Needs a shared cache (Redis/Memcached) to hold across workers.
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER')  # e.g. HTTP_X_FORWARDED_FOR behind our proxy
+RATE_LIMITS = {
+    'upload_drawing': {'rate': '20/h', 'burst': 5},
+    'review': {'rate': '10/h', 'burst': 3},
+    'register': {'rate': '5/h', 'burst': 3},
+    'payment': {'rate': '10/h', 'burst': 5},
 }
 
 
@@ -127,6 +244,51 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are named by content hash and stored once (see toys/storage.py);
+# manage.py gc_media deletes files unreferenced for MEDIA_GC_GRACE_HOURS.
+STORAGES = {
+    'default': {'BACKEND': 'toys.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_GC_GRACE_HOURS = 24
+
+# Media under these MEDIA_ROOT subdirectories is public; customer_drawings is
+# only served to the owner or staff through the protected_media view.
+MEDIA_PUBLIC_DIRS = ['toys', 'accessories', 'reviews', 'homepage_review']
+
+# None streams files from Django. 'x-accel-redirect' (nginx) or 'x-sendfile'
+# (Apache/lighttpd) hands the transfer to the front proxy after the access check.
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Resumable chunked uploads for drawing images. Chunks are streamed into
+# CHUNKED_UPLOAD_DIR and only moved into MEDIA_ROOT once complete and valid.
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'tmp', 'uploads')
+CHUNKED_UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_PIXELS = 40_000_000
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Drawings whose image hashes differ in at most this many of 64 bits are shown
+# as likely duplicates in the admin. Each process rebuilds its in-memory index
+# this often to drop edited and deleted drawings.
+DRAWING_DUPLICATE_DISTANCE = 6
+DRAWING_DUPLICATE_INDEX_SECONDS = 600
+
+# Optional JSON size-band table for drawing prices (see toys/pricing.py). It
+# is cached in memory and re-read when the file changes.
+DRAWING_PRICE_TABLE = os.environ.get('DRAWING_PRICE_TABLE', os.path.join(BASE_DIR, 'pricing.json'))
+DRAWING_PRICE_TABLE_RELOAD_SECONDS = 5
+PRICE_QUOTE_MAX_ITEMS = 100
+
+# Live drawing status updates (Server-Sent Events). Serve the stream under
+# ASGI so open connections do not each hold a worker thread.
+DRAWING_EVENTS_POLL_SECONDS = 2
+DRAWING_EVENTS_MAX_SECONDS = 300
+
+DRAWINGS_PER_PAGE = 20
+ORDERS_PER_PAGE = 10
+
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 LOGIN_REDIRECT_URL = 'home'
@@ -1,14 +1,39 @@
+import csv
+
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import Toy, Accessory, Review, ToyDrawing, UserProfile, HomepageReview
+from .cart import CART_ITEM_TYPES
+from .duplicates import likely_duplicates
+from .exports import export_response
+from .imagehash import distance
+from .models import (Toy, Accessory, Review, ToyDrawing, UserProfile, HomepageReview, DrawingStatusChange, StatCounter,
+                     DailySales, Order, OrderLine)
+from .ratelimit import rate_limit_stats
+from .stats import dashboard
+from .status import change_status
+
+
+def export_action(name, export_format):
+    # Streams the selected rows; see toys.exports
+    def action(modeladmin, request, queryset):
+        return export_response(name, export_format, queryset)
+    action.__name__ = f'export_{export_format}'
+    action.short_description = f"Export selected {name} as {export_format.upper()}"
+    return action
 
 
 @admin.register(Toy)
 class ToyAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'stock')
-    search_fields = ('name',)
+    list_display = ('name', 'sku', 'price', 'stock')
+    search_fields = ('name', 'sku')
     list_filter = ('price',)
 
 
@@ -21,6 +46,7 @@ class AccessoryAdmin(admin.ModelAdmin):
 
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('user_full_name', 'toy', 'rating', 'created_at')
+    actions = [export_action('reviews', 'csv'), export_action('reviews', 'jsonl')]
 
     def user_full_name(self, obj):
         # Use get_full_name if available, otherwise use username
@@ -34,29 +60,178 @@ admin.site.register(Review, ReviewAdmin)
 
 @admin.register(ToyDrawing)
 class ToyDrawingAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'width', 'height', 'price', 'status', 'is_approved', 'created_at')
+    list_display = ('name', 'description', 'width', 'height', 'price', 'status', 'is_approved', 'created_at',
+                    'duplicates')
     search_fields = ('name', 'description')
     list_filter = ('status', 'is_approved', 'created_at')
-
-    actions = ['approve_drawing', 'reject_drawing', 'set_in_progress', 'set_completed']
+    readonly_fields = ('likely_duplicates',)
+
+    actions = ['approve_drawing', 'reject_drawing', 'set_in_progress', 'set_completed',
+               export_action('drawings', 'csv'), export_action('drawings', 'jsonl')]
+
+    @admin.display(description='Duplicates')
+    def duplicates(self, obj):
+        # From the in-memory index only, so the change list makes no query per row
+        matches = likely_duplicates(obj)
+        if not matches:
+            return '-'
+        ids = ','.join(str(drawing_id) for drawing_id in [obj.id] + [drawing_id for _, drawing_id in matches])
+        return format_html('<a href="{}?id__in={}">{}</a>', reverse('admin:toys_toydrawing_changelist'), ids,
+                           len(matches))
+
+    @admin.display(description='Likely duplicates')
+    def likely_duplicates(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
+        matches = likely_duplicates(obj)
+        drawings = ToyDrawing.objects.select_related('user').in_bulk([drawing_id for _, drawing_id in matches])
+        # The index may predate an edit or deletion; check against the current hashes
+        links = [
+            (reverse('admin:toys_toydrawing_change', args=[drawing.id]), drawing.name, drawing.user.username,
+             distance(drawing.image_hash, obj.image_hash))
+            for drawing in (drawings[drawing_id] for _, drawing_id in matches if drawing_id in drawings)
+            if drawing.image_hash is not None
+            and distance(drawing.image_hash, obj.image_hash) <= settings.DRAWING_DUPLICATE_DISTANCE
+        ]
+        if not links:
+            return '-'
+        return format_html_join(format_html('<br>'), '<a href="{}">{}</a> by {}, {} bit(s) apart', links)
 
     def approve_drawing(self, request, queryset):
-        queryset.update(is_approved=True, status='in_progress')
+        change_status(queryset, 'in_progress', is_approved=True, changed_by=request.user)
         self.message_user(request, "Selected drawings have been approved and set to 'In Progress'.")
 
     def reject_drawing(self, request, queryset):
-        queryset.update(is_approved=False, status='rejected')
+        change_status(queryset, 'rejected', is_approved=False, changed_by=request.user)
         self.message_user(request, "Selected drawings have been rejected.")
 
     def set_in_progress(self, request, queryset):
-        queryset.update(status='in_progress')
+        change_status(queryset, 'in_progress', changed_by=request.user)
         self.message_user(request, "Selected drawings have been set to 'In Progress'.")
 
     def set_completed(self, request, queryset):
-        queryset.update(status='completed')
+        change_status(queryset, 'completed', changed_by=request.user)
         self.message_user(request, "Selected drawings have been set to 'Completed'.")
 
 
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    fields = ('item_type', 'item_id', 'name', 'unit_price', 'quantity')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    # Lines are a record of the purchase
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'total_price', 'status', 'payment_status', 'created_at')
+    list_filter = ('status', 'payment_status', 'created_at')
+    list_select_related = ('user',)
+    inlines = [OrderLineInline]
+    actions = [export_action('orders', 'csv'), export_action('orders', 'jsonl')]
+
+
+@admin.register(DrawingStatusChange)
+class DrawingStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('drawing', 'old_status', 'new_status', 'is_approved', 'changed_by', 'created_at')
+    list_filter = ('new_status',)
+    list_select_related = ('drawing', 'changed_by')
+
+    # The log is append-only and written by the drawing admin actions
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StatCounter)
+class OperationsDashboardAdmin(admin.ModelAdmin):
+    # Shows the precomputed counters instead of a change list; they are only
+    # written by toys.stats, so they cannot be edited here.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        context = {
+            **self.admin_site.each_context(request),
+            **dashboard(),
+            'rate_limits': rate_limit_stats(),
+            'title': 'Operations dashboard',
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/toys/dashboard.html', context)
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    # A report over the rollups written by manage.py rollup_sales; it never reads orders directly
+    list_display = ('date', 'orders', 'paid_orders', 'revenue', 'units', 'drawings_submitted', 'drawings_approved')
+    date_hierarchy = 'date'
+    change_list_template = 'admin/toys/dailysales/change_list.html'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('items')
+
+    def units(self, obj):
+        return ', '.join(f"{item.item_type}: {item.units}" for item in obj.items.all()) or '-'
+
+    def get_urls(self):
+        return [
+            path('export/', self.admin_site.admin_view(self.export_csv), name='toys_dailysales_export'),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        if hasattr(response, 'context_data') and 'cl' in response.context_data:
+            response.context_data['totals'] = response.context_data['cl'].queryset.aggregate(
+                orders=Sum('orders'), paid_orders=Sum('paid_orders'), revenue=Sum('revenue'),
+                drawings_submitted=Sum('drawings_submitted'), drawings_approved=Sum('drawings_approved'),
+            )
+        return response
+
+    def export_csv(self, request):
+        # Same date filters as the change list (?date__gte=, ?date__lt=, date_hierarchy's year/month/day)
+        days = self.get_changelist_instance(request).get_queryset(request)
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="daily_sales.csv"'
+        writer = csv.writer(response)
+        item_types = list(CART_ITEM_TYPES)
+        writer.writerow(['date', 'orders', 'paid_orders', 'revenue', 'drawings_submitted', 'drawings_approved']
+                        + [f'{item_type}_{column}' for item_type in item_types for column in ('units', 'revenue')])
+        for day in days.order_by('date'):
+            items = {item.item_type: item for item in day.items.all()}
+            row = [day.date, day.orders, day.paid_orders, day.revenue, day.drawings_submitted, day.drawings_approved]
+            for item_type in item_types:
+                item = items.get(item_type)
+                row += [item.units, item.revenue] if item else [0, '0.00']
+            writer.writerow(row)
+        return response
+
+
 # Create an admin action to create missing UserProfiles
 @admin.action(description="Create missing UserProfiles")
 def create_missing_profiles(modeladmin, request, queryset):
@@ -6,3 +6,5 @@ class ToysConfig(AppConfig):
 
     def ready(self):
         import toys.signals
+        from toys.ratelimit import check_cache
+        check_cache()
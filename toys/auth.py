@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that keeps a short-lived snapshot of each logged-in user in
+    the cache, so AuthenticationMiddleware does not query auth_user on every
+    request. Snapshots are dropped when the user is saved or deleted and on
+    logout (see toys/signals.py); changes made with queryset.update() are
+    picked up once AUTH_USER_CACHE_SECONDS expires.
+
+    The session auth hash is still checked against the snapshot, so a
+    password change logs other sessions out as soon as the snapshot is dropped.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_SECONDS)
+        return user
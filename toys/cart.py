@@ -0,0 +1,278 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Least
+
+from .models import Toy, Accessory, ToyDrawing, Cart, CartItem, CartRequest
+
+CART_ITEM_TYPES = {
+    'toy': Toy,
+    'accessory': Accessory,
+    'drawing': ToyDrawing,
+}
+
+# Guests can only add catalog items; one-letter codes keep the cookie small.
+GUEST_ITEM_CODES = {'toy': 't', 'accessory': 'a'}
+GUEST_ITEM_TYPES = {code: item_type for item_type, code in GUEST_ITEM_CODES.items()}
+
+COOKIE_SALT = 'toys.cart'
+
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+
+
+class GuestCartFull(Exception):
+    pass
+
+
+class CartError(Exception):
+    pass
+
+
+def read_guest_cart(request):
+    """
+    Return the anonymous visitor's cart as ``{(item_type, item_id): quantity}``.
+    The cookie is signed, so a tampered value is treated as an empty cart.
+    """
+    value = request.get_signed_cookie(settings.GUEST_CART_COOKIE_NAME, default='', salt=COOKIE_SALT)
+    lines = {}
+    for entry in value.split(','):
+        try:
+            key, quantity = entry.split(':')
+            lines[(GUEST_ITEM_TYPES[key[0]], int(key[1:]))] = min(int(quantity), settings.CART_MAX_QUANTITY)
+        except (ValueError, KeyError, IndexError):
+            continue
+    return lines
+
+
+def add_to_guest_cart(lines, item_type, item_id, quantity=1):
+    key = (item_type, item_id)
+    if key not in lines and len(lines) >= settings.GUEST_CART_MAX_LINES:
+        raise GuestCartFull
+    lines[key] = min(lines.get(key, 0) + quantity, settings.CART_MAX_QUANTITY)
+    return lines
+
+
+def write_guest_cart(response, lines):
+    value = ','.join(f'{GUEST_ITEM_CODES[item_type]}{item_id}:{quantity}'
+                     for (item_type, item_id), quantity in lines.items() if quantity > 0)
+    response.set_signed_cookie(settings.GUEST_CART_COOKIE_NAME, value, salt=COOKIE_SALT,
+                               max_age=settings.GUEST_CART_COOKIE_AGE, httponly=True, samesite='Lax')
+    return response
+
+
+def guest_cart_items(lines):
+    """Load the items in a guest cart with one query per item type."""
+    items = {}
+    for item_type, model in CART_ITEM_TYPES.items():
+        ids = [item_id for (line_type, item_id) in lines if line_type == item_type]
+        if ids:
+            for item_id, item in model.objects.in_bulk(ids).items():
+                items[(item_type, item_id)] = item
+    return [(items[key], quantity) for key, quantity in lines.items() if key in items]
+
+
+def existing_keys(lines):
+    """The ``(item_type, item_id)`` keys of ``lines`` whose item still exists."""
+    keys = set()
+    for item_type, model in CART_ITEM_TYPES.items():
+        ids = [item_id for (line_type, item_id) in lines if line_type == item_type]
+        if ids:
+            keys.update((item_type, item_id) for item_id in model.objects.filter(id__in=ids).values_list('id', flat=True))
+    return keys
+
+
+def add_cart_items(cart, rows):
+    """
+    Add ``(content_type_id, object_id, quantity)`` rows to ``cart`` in a single
+    ``INSERT ... ON CONFLICT DO UPDATE`` that increments lines already in the
+    cart, capped at CART_MAX_QUANTITY. Relies on the unique_cart_item
+    constraint, so concurrent adds never lose an increment or create a
+    duplicate line.
+    """
+    if not rows:
+        return
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for content_type_id, object_id, quantity in rows:
+            increment_cart_item(cart, content_type_id, object_id, quantity)
+        return
+
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    total = f'{table}.quantity + excluded.quantity'
+    sql = (
+        f'INSERT INTO {table} (cart_id, content_type_id, object_id, quantity) VALUES {values} '
+        f'ON CONFLICT (cart_id, content_type_id, object_id) '
+        f'DO UPDATE SET quantity = CASE WHEN {total} > %s THEN %s ELSE {total} END'
+    )
+    params = [value for row in rows for value in (cart.id, *row)]
+    params += [settings.CART_MAX_QUANTITY, settings.CART_MAX_QUANTITY]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def increment_cart_item(cart, content_type_id, object_id, quantity=1):
+    """Portable fallback for add_cart_items: an F() update, or an insert if the line is new."""
+    line = CartItem.objects.filter(cart=cart, content_type_id=content_type_id, object_id=object_id)
+    if line.update(quantity=Least(F('quantity') + quantity, settings.CART_MAX_QUANTITY)):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart=cart, content_type_id=content_type_id, object_id=object_id,
+                                    quantity=min(quantity, settings.CART_MAX_QUANTITY))
+    except IntegrityError:
+        # Another request created the line first
+        line.update(quantity=Least(F('quantity') + quantity, settings.CART_MAX_QUANTITY))
+
+
+def merge_guest_cart(user, lines):
+    """
+    Add a guest cart's lines to the user's database cart with one bulk upsert.
+    Lines for items deleted since they were added are dropped.
+    """
+    valid = existing_keys(lines)
+    cart, created = Cart.objects.get_or_create(user=user)
+    content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+    add_cart_items(cart, [
+        (content_types[CART_ITEM_TYPES[item_type]].id, item_id, quantity)
+        for (item_type, item_id), quantity in lines.items() if (item_type, item_id) in valid
+    ])
+    return cart
+
+
+def parse_operations(operations):
+    """
+    Validate a cart API batch: a list of ``{"op", "type", "id", "quantity"}``
+    objects. Returns ``(op, item_type, item_id, quantity)`` tuples.
+    """
+    if not isinstance(operations, list) or not 0 < len(operations) <= settings.CART_API_MAX_OPERATIONS:
+        raise CartError(f"'operations' must be a list of 1 to {settings.CART_API_MAX_OPERATIONS} operations.")
+    parsed = []
+    for operation in operations:
+        try:
+            op, item_type, item_id = operation['op'], operation['type'], int(operation['id'])
+            quantity = int(operation.get('quantity', 1 if op == 'add' else 0))
+        except (TypeError, KeyError, ValueError):
+            raise CartError("Each operation needs 'op', 'type' and a numeric 'id'.")
+        if op not in CART_OPERATIONS:
+            raise CartError(f"Unknown operation {op!r}.")
+        if item_type not in CART_ITEM_TYPES:
+            raise CartError(f"Unknown item type {item_type!r}.")
+        if not 0 <= quantity <= settings.CART_MAX_QUANTITY or (op == 'add' and quantity == 0):
+            raise CartError(f"Invalid quantity {quantity}.")
+        parsed.append((op, item_type, item_id, quantity))
+    return parsed
+
+
+def apply_operations(user, operations):
+    """
+    Apply parsed operations to the user's cart and return the ``(item_type,
+    item_id)`` keys touched along with their items. Operations on the same
+    item are folded first, so each line costs one statement: adds become a
+    single increment upsert, and a set or remove (plus any adds after it)
+    becomes an absolute upsert or a delete. No line is read-modified-written,
+    so concurrent requests cannot lose updates.
+    """
+    items = {}
+    for item_type, model in CART_ITEM_TYPES.items():
+        ids = {item_id for _, line_type, item_id, _ in operations if line_type == item_type}
+        if ids:
+            # Drawings are private: another user's are reported as missing
+            found = (model.objects.filter(user=user) if item_type == 'drawing' else model.objects).in_bulk(ids)
+            missing = ids - found.keys()
+            if missing:
+                raise CartError(f"No {item_type} with id {min(missing)}.")
+            items.update(((item_type, item_id), item) for item_id, item in found.items())
+
+    # key -> [absolute, quantity]: absolute lines replace the stored quantity,
+    # the others are added to it.
+    folded = {}
+    for op, item_type, item_id, quantity in operations:
+        line = folded.setdefault((item_type, item_id), [False, 0])
+        if op == 'add':
+            line[1] = min(line[1] + quantity, settings.CART_MAX_QUANTITY)
+        else:
+            line[:] = [True, quantity if op == 'set' else 0]
+
+    content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+    type_ids = {item_type: content_types[model].id for item_type, model in CART_ITEM_TYPES.items()}
+    increments, replacements, removals = [], [], []
+    for (item_type, item_id), (absolute, quantity) in folded.items():
+        row = (type_ids[item_type], item_id, quantity)
+        if not absolute:
+            increments.append(row)
+        elif quantity:
+            replacements.append(row)
+        else:
+            removals.append(row)
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        add_cart_items(cart, increments)
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, content_type_id=ct, object_id=item_id, quantity=q) for ct, item_id, q in replacements],
+            update_conflicts=True, unique_fields=['cart', 'content_type', 'object_id'], update_fields=['quantity'],
+        )
+        if removals:
+            removed = Q()
+            for ct, item_id, _ in removals:
+                removed |= Q(content_type_id=ct, object_id=item_id)
+            CartItem.objects.filter(removed, cart=cart).delete()
+
+    return {key: items[key] for key in folded}
+
+
+def cart_response(user, changed):
+    """JSON body for the cart API: the changed lines and the new cart totals."""
+    quantities = {}
+    total_price, item_count = 0, 0
+    for cart_item in CartItem.objects.filter(cart__user=user).prefetch_related('item'):
+        if cart_item.item is not None:
+            quantities[(cart_item.content_type_id, cart_item.object_id)] = cart_item.quantity
+            total_price += cart_item.item.price * cart_item.quantity
+            item_count += cart_item.quantity
+
+    content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+    lines = []
+    for (item_type, item_id), item in changed.items():
+        quantity = quantities.get((content_types[CART_ITEM_TYPES[item_type]].id, item_id), 0)
+        lines.append({
+            'type': item_type,
+            'id': item_id,
+            'name': item.name,
+            'price': str(item.price),
+            'quantity': quantity,
+            'subtotal': str(item.price * quantity),
+        })
+
+    return {
+        'lines': lines,
+        'total_price': str(total_price),
+        'item_count': item_count,
+    }
+
+
+def run_cart_request(user, operations, idempotency_key=None):
+    """
+    Apply a cart API batch and return its response. With an idempotency key the
+    response is stored in the same transaction as the cart changes, so a
+    retried request returns the first response instead of applying twice.
+    """
+    if idempotency_key:
+        stored = CartRequest.objects.filter(user=user, key=idempotency_key).values_list('response', flat=True).first()
+        if stored is not None:
+            return stored
+
+    try:
+        with transaction.atomic():
+            response = cart_response(user, apply_operations(user, operations))
+            if idempotency_key:
+                CartRequest.objects.create(user=user, key=idempotency_key, response=response)
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        stored = idempotency_key and CartRequest.objects.filter(user=user, key=idempotency_key).first()
+        if not stored:
+            raise
+        return stored.response
+    return response
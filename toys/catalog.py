@@ -0,0 +1,155 @@
+"""
+Bulk catalog import for manage.py import_catalog.
+
+Rows are upserted by SKU in batches with one ``INSERT ... ON CONFLICT`` per
+model, and accessories are linked to their toy through an in-memory SKU map
+rather than a lookup per row. Images are copied into the content-addressed
+storage by a thread pool, so re-importing an unchanged image copies nothing.
+Each batch is one transaction; images of a failed batch are left unreferenced
+for gc_media.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Accessory, Toy
+
+CATALOG_TYPES = {
+    'toy': Toy,
+    'accessory': Accessory,
+}
+CATALOG_FIELDS = ['name', 'description', 'price', 'stock', 'image']
+MAX_PRICE = Decimal('99999999.99')  # Toy.price and Accessory.price are max_digits=10, decimal_places=2
+
+
+class CatalogError(Exception):
+    pass
+
+
+def read_rows(path):
+    """Yield ``(line, row dict)`` from a CSV file with a header or a JSON Lines file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text)
+                    except ValueError as e:
+                        yield line, CatalogError(f"Invalid JSON: {e}")
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def clean_row(row):
+    """Validate one input row and return ``(item_type, values)``; raise CatalogError if it is invalid."""
+    if isinstance(row, Exception):
+        raise row
+    item_type = (row.get('type') or '').strip()
+    if item_type not in CATALOG_TYPES:
+        raise CatalogError(f"Unknown type {item_type!r}.")
+    values = {}
+    for field in ('sku', 'name', 'image'):
+        values[field] = str(row.get(field) or '').strip()
+        if not values[field]:
+            raise CatalogError(f"Missing {field}.")
+    values['description'] = str(row.get('description') or '')
+    try:
+        values['price'] = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+        values['stock'] = int(row.get('stock') or 0)
+        if not values['price'].is_finite() or values['price'] > MAX_PRICE:
+            raise CatalogError(f"Price must be a number up to {MAX_PRICE}.")
+        if values['price'] < 0 or values['stock'] < 0:
+            raise CatalogError("Price and stock must not be negative.")
+    except (InvalidOperation, ValueError, TypeError):
+        raise CatalogError("Invalid price or stock.")
+    if item_type == 'accessory':
+        values['toy'] = str(row.get('toy') or '').strip()
+        if not values['toy']:
+            raise CatalogError("Missing toy SKU for accessory.")
+    return item_type, values
+
+
+def ingest_image(source, upload_to):
+    """Copy ``source`` into storage under ``upload_to``; returns the stored name."""
+    with open(source, 'rb') as f:
+        return default_storage.save(upload_to + os.path.basename(source), File(f))
+
+
+def ingest_images(rows, image_dir, workers):
+    """
+    Ingest the images of ``(line, item_type, values)`` rows in parallel, each
+    distinct file once. Replaces ``values['image']`` with the stored name;
+    returns the rows whose image could be stored and the errors.
+    """
+    image_dir = os.path.abspath(image_dir)
+    sources = {}
+    for line, item_type, values in rows:
+        upload_to = CATALOG_TYPES[item_type]._meta.get_field('image').upload_to
+        sources.setdefault((upload_to, os.path.abspath(os.path.join(image_dir, values['image']))), None)
+
+    def ingest(upload_to, source):
+        if os.path.commonpath([source, image_dir]) != image_dir:
+            raise CatalogError("Image is outside the image directory.")
+        return ingest_image(source, upload_to)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {key: pool.submit(ingest, *key) for key in sources}
+        for key, future in futures.items():
+            try:
+                sources[key] = future.result()
+            except (CatalogError, OSError) as e:
+                sources[key] = e
+
+    ok, errors = [], []
+    for line, item_type, values in rows:
+        upload_to = CATALOG_TYPES[item_type]._meta.get_field('image').upload_to
+        result = sources[upload_to, os.path.abspath(os.path.join(image_dir, values['image']))]
+        if isinstance(result, Exception):
+            errors.append((line, f"Image {values['image']!r}: {result}"))
+        else:
+            values['image'] = result
+            ok.append((line, item_type, values))
+    return ok, errors
+
+
+def upsert_batch(model, rows, toy_ids=None):
+    """Insert or update ``rows`` (lists of cleaned values) of ``model`` by SKU in one statement."""
+    objects = []
+    for values in rows:
+        values = dict(values)
+        if model is Accessory:
+            values['toy_id'] = toy_ids[values.pop('toy')]
+        objects.append(model(**values))
+    update_fields = CATALOG_FIELDS + (['toy'] if model is Accessory else [])
+    model.objects.bulk_create(objects, update_conflicts=True, unique_fields=['sku'], update_fields=update_fields)
+
+
+def import_batch(model, rows, image_dir, workers, toy_ids=None):
+    """
+    Import one batch of ``(line, item_type, values)`` rows. Returns
+    ``(imported, errors)``. The rows are written in a single transaction; if
+    it fails, no row of the batch is kept.
+    """
+    errors = []
+    if model is Accessory:
+        errors += [(line, f"Unknown toy SKU {values['toy']!r}.") for line, _, values in rows if values['toy'] not in toy_ids]
+        rows = [row for row in rows if row[2]['toy'] in toy_ids]
+    # A SKU may only be upserted once per statement; the last row for it wins
+    rows = list({values['sku']: (line, item_type, values) for line, item_type, values in rows}.values())
+
+    rows, image_errors = ingest_images(rows, image_dir, workers)
+    errors += image_errors
+    try:
+        with transaction.atomic():
+            upsert_batch(model, [values for _, _, values in rows], toy_ids)
+    except Exception as e:
+        return 0, errors + [(line, f"Batch failed: {e}") for line, _, _ in rows]
+    return len(rows), errors
@@ -0,0 +1,153 @@
+"""
+Two-tier cache for hot catalog objects: toys, a toy's accessories and its
+review summary.
+
+Reads try a bounded LRU in this process, then the shared cache, then the
+database. A shared entry is stored as ``(version, value)`` beside the
+object's version, and both are fetched in one ``get_many``; an entry whose
+version differs is ignored, so a worker that read the database just before
+a change cannot put a stale copy back.
+
+Model signals (toys/signals.py) call ``invalidate``, which takes the next
+catalog generation number from the database (toys/sequences.py), stores it
+as the object's version and records the object's key in a changelog under
+it. Generations never repeat or go back, even when cache keys expire or are
+evicted. Every process reads the generation at most once per
+CATALOG_SYNC_SECONDS and drops the changed keys from its LRU (all of it if
+it fell too far behind or the changelog is gone), so no worker shows a
+stale price or stock level for longer than that. Writes made with
+queryset.update() fire no signals and must call ``invalidate`` themselves.
+
+ContentTypes are not cached here: ContentTypeManager already keeps them in
+process memory for the life of the worker, and warm-up loads them.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count
+
+from .models import Accessory, Review, Toy
+from .sequences import current_value, next_value
+
+GENERATION = 'catalog'
+CHANGE_KEY = 'catalog:change:{}'
+VERSION_KEY = 'catalog:version:{}'
+VALUE_KEY = 'catalog:value:{}'
+CHANGE_TIMEOUT = 3600
+# Evicting more changed keys than this one by one is no better than starting cold
+MAX_SYNC_CHANGES = 500
+MISSING = object()
+
+
+class LocalCache:
+    """A thread-safe LRU of at most ``size`` entries."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key, MISSING)
+            if value is not MISSING:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = LocalCache(settings.CATALOG_LOCAL_CACHE_SIZE)
+_sync_lock = threading.Lock()
+_generation = None
+_synced_at = None
+
+
+def sync():
+    """Drop the entries other processes have invalidated, checking the changelog at most every CATALOG_SYNC_SECONDS."""
+    global _generation, _synced_at
+    now = time.monotonic()
+    if _synced_at is not None and now - _synced_at < settings.CATALOG_SYNC_SECONDS:
+        return
+    with _sync_lock:
+        if _synced_at is not None and now - _synced_at < settings.CATALOG_SYNC_SECONDS:
+            return
+        generation = current_value(GENERATION)
+        if generation != _generation:
+            changes = None
+            if _generation is not None and 0 < generation - _generation <= MAX_SYNC_CHANGES:
+                keys = [CHANGE_KEY.format(g) for g in range(_generation + 1, generation + 1)]
+                changes = cache.get_many(keys)
+                if len(changes) < len(keys):
+                    changes = None
+            if changes is None:
+                _local.clear()
+            else:
+                for name in changes.values():
+                    _local.delete(name)
+            _generation = generation
+        _synced_at = now
+
+
+def get(name, loader):
+    """The value cached under ``name``, or ``loader()`` stored in both tiers."""
+    sync()
+    value = _local.get(name)
+    if value is not MISSING:
+        return value
+
+    started = _generation
+    version_key, value_key = VERSION_KEY.format(name), VALUE_KEY.format(name)
+    shared = cache.get_many([version_key, value_key])
+    version = shared.get(version_key, 0)
+    entry = shared.get(value_key)
+    if entry is not None and entry[0] == version:
+        value = entry[1]
+    else:
+        value = loader()
+        cache.set(value_key, (version, value), settings.CATALOG_CACHE_SECONDS)
+    with _sync_lock:
+        # If this process synced while we loaded, the change that made it sync may be newer than our copy
+        if _generation == started:
+            _local.set(name, value)
+    return value
+
+
+def invalidate(name):
+    """Make every process reload ``name``: at once in this one, within CATALOG_SYNC_SECONDS in the others."""
+    generation = next_value(GENERATION)
+    cache.set(VERSION_KEY.format(name), generation, None)
+    cache.delete(VALUE_KEY.format(name))
+    cache.set(CHANGE_KEY.format(generation), name, CHANGE_TIMEOUT)
+    _local.delete(name)
+
+
+def get_toy(toy_id):
+    """The Toy with ``toy_id``, or None. Shared between requests: do not modify it."""
+    return get(f'toy:{toy_id}', lambda: Toy.objects.filter(pk=toy_id).first())
+
+
+def get_accessories(toy_id):
+    return get(f'accessories:{toy_id}', lambda: list(Accessory.objects.filter(toy_id=toy_id).order_by('id')))
+
+
+def get_review_summary(toy_id):
+    """``{'count': n, 'average': rating or None}`` for the toy's reviews."""
+    return get(f'reviews:{toy_id}',
+               lambda: Review.objects.filter(toy_id=toy_id).aggregate(count=Count('id'), average=Avg('rating')))
@@ -0,0 +1,102 @@
+"""
+Near-duplicate lookup over drawing image hashes.
+
+DuplicateIndex is a multi-index hash table: every 64-bit hash is split into
+four 16-bit chunks and each chunk value maps to the drawings that have it.
+Two hashes at most ``d`` bits apart agree within ``d // 4`` bits on at least
+one chunk, so a lookup probes each chunk's value and its near neighbours,
+then checks the full distance of the few drawings found. With the default
+distance of 6 that is 4 x 17 dict lookups, however many drawings there are.
+
+Each process builds its index on first use and then only reads drawings
+added since, by id, at most once a second. It is rebuilt every
+DRAWING_DUPLICATE_INDEX_SECONDS to drop edited and deleted drawings.
+"""
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations
+
+from django.conf import settings
+
+from .imagehash import MASK
+from .models import ToyDrawing
+
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+REFRESH_SECONDS = 1
+
+
+@lru_cache(maxsize=None)
+def flip_masks(radius):
+    """Every mask of at most ``radius`` set bits within a chunk."""
+    return [sum(1 << bit for bit in bits)
+            for r in range(radius + 1) for bits in combinations(range(CHUNK_BITS), r)]
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self.tables = [{} for _ in range(CHUNKS)]
+        self.hashes = {}
+        self.last_id = 0
+        self.built_at = time.monotonic()
+        self.refreshed_at = None
+
+    def add(self, drawing_id, value):
+        value &= MASK
+        self.hashes[drawing_id] = value
+        for i, table in enumerate(self.tables):
+            table.setdefault((value >> (i * CHUNK_BITS)) & CHUNK_MASK, []).append(drawing_id)
+
+    def load(self):
+        """Index the drawings hashed since the last load."""
+        rows = (ToyDrawing.objects.filter(id__gt=self.last_id, image_hash__isnull=False).order_by('id')
+                .values_list('id', 'image_hash'))
+        for drawing_id, value in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            self.add(drawing_id, value)
+            self.last_id = drawing_id
+        self.refreshed_at = time.monotonic()
+
+    def matches(self, value, max_distance, exclude=None):
+        """``[(distance, drawing_id)]`` for the drawings within ``max_distance`` bits of ``value``, closest first."""
+        value &= MASK
+        masks = flip_masks(max_distance // CHUNKS)
+        candidates = set()
+        for i, table in enumerate(self.tables):
+            chunk = (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+            for mask in masks:
+                candidates.update(table.get(chunk ^ mask, ()))
+        candidates.discard(exclude)
+
+        found = []
+        for drawing_id in candidates:
+            bits = (self.hashes[drawing_id] ^ value).bit_count()
+            if bits <= max_distance:
+                found.append((bits, drawing_id))
+        return sorted(found)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_duplicate_index():
+    """This process's index, with the drawings added in the last REFRESH_SECONDS at most missing."""
+    global _index
+    now = time.monotonic()
+    with _lock:
+        if _index is None or now - _index.built_at > settings.DRAWING_DUPLICATE_INDEX_SECONDS:
+            _index = DuplicateIndex()
+            _index.load()
+        elif now - _index.refreshed_at > REFRESH_SECONDS:
+            _index.load()
+        return _index
+
+
+def likely_duplicates(drawing, max_distance=None):
+    """``[(distance, drawing_id)]`` for the drawings whose image looks like ``drawing``'s."""
+    if drawing.image_hash is None:
+        return []
+    max_distance = settings.DRAWING_DUPLICATE_DISTANCE if max_distance is None else max_distance
+    return get_duplicate_index().matches(drawing.image_hash, max_distance, exclude=drawing.id)
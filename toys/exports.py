@@ -0,0 +1,104 @@
+"""
+Streaming CSV / JSON Lines exports of drawings, orders and reviews.
+
+Rows are read with ``values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+and written out one line at a time, so no model instances are built and
+memory stays flat however many rows are exported. Related columns (the
+user's name, the toy's name) are joined in the same query rather than
+looked up per row.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Order, Review, ToyDrawing
+
+# name -> (model, [(column, field lookup)])
+EXPORTS = {
+    'drawings': (ToyDrawing, [
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('name', 'name'),
+        ('description', 'description'),
+        ('width', 'width'),
+        ('height', 'height'),
+        ('base_price', 'base_price'),
+        ('price', 'price'),
+        ('color', 'color'),
+        ('status', 'status'),
+        ('is_approved', 'is_approved'),
+        ('image', 'image'),
+        ('created_at', 'created_at'),
+    ]),
+    'orders': (Order, [
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('email', 'user__email'),
+        ('total_price', 'total_price'),
+        ('status', 'status'),
+        ('payment_status', 'payment_status'),
+        ('created_at', 'created_at'),
+    ]),
+    'reviews': (Review, [
+        ('id', 'id'),
+        ('toy_id', 'toy_id'),
+        ('toy', 'toy__name'),
+        ('user', 'user__username'),
+        ('rating', 'rating'),
+        ('comment', 'comment'),
+        ('created_at', 'created_at'),
+    ]),
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """A file-like object for csv.writer that hands each line back instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+def export_rows(name, queryset=None):
+    """The header and a row iterator for export ``name``, optionally restricted to ``queryset``."""
+    model, columns = EXPORTS[name]
+    if queryset is None:
+        queryset = model.objects.all()
+    rows = (queryset.order_by('pk').values_list(*[lookup for _, lookup in columns])
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE))
+    return [column for column, _ in columns], rows
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(name, export_format, queryset=None):
+    header, rows = export_rows(name, queryset)
+    if export_format == 'csv':
+        return csv_lines(header, rows)
+    return jsonl_lines(header, rows)
+
+
+def export_response(name, export_format, queryset=None):
+    filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingHttpResponse(
+        export_lines(name, export_format, queryset),
+        content_type=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,194 @@
+"""
+Faceted browsing for toy_list.
+
+Each process keeps a FacetIndex: for every facet value (a price band, in
+stock, "rated N stars and up", has accessories) the set of toy ids that
+match it. Filtering is the intersection of the selected sets, and each
+facet count is the size of an intersection, so browsing costs no
+aggregate queries.
+
+Indexes are kept current incrementally. Saving or deleting a toy,
+accessory or review publishes the affected toy id in the cache under the
+next number of a database sequence (see toys/signals.py and
+toys/sequences.py), so versions never repeat, even when cache keys expire.
+Before answering, a process compares its index version with the sequence
+and re-reads only the published toys, in one query. If the changelog has
+expired, or a bulk change was published with ``publish_all``, it rebuilds
+the index from scratch; it also rebuilds every FACET_INDEX_SECONDS.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count
+from django.utils.http import urlencode
+
+from .models import Toy
+from .sequences import current_value, next_value
+
+VERSION = 'facets'
+CHANGE_KEY = 'facets:change:{}'
+CHANGE_TIMEOUT = 24 * 3600
+ALL_TOYS = '*'
+# Re-reading more changed toys than this is slower than a rebuild
+MAX_INCREMENTAL_CHANGES = 500
+RATINGS = (4, 3, 2, 1)
+
+FACET_PARAMS = ('price', 'in_stock', 'rating', 'accessories')
+FACET_LABELS = {
+    'price': "Price",
+    'in_stock': "Availability",
+    'rating': "Customer rating",
+    'accessories': "Accessories",
+}
+
+
+def price_bands():
+    """``[(key, label, low, high)]`` from TOY_PRICE_BANDS; ``high`` is exclusive and None for the last band."""
+    bounds = [Decimal(str(bound)) for bound in settings.TOY_PRICE_BANDS]
+    bands = []
+    for i, high in enumerate(bounds + [None]):
+        low = bounds[i - 1] if i else None
+        if low is None:
+            label = f"Under ${high}"
+        elif high is None:
+            label = f"${low} and up"
+        else:
+            label = f"${low} to ${high}"
+        bands.append((str(i), label, low, high))
+    return bands
+
+
+def facet_options(bands):
+    """``{facet: [(value, label)]}`` for every facet."""
+    return {
+        'price': [(key, label) for key, label, low, high in bands],
+        'in_stock': [('1', "In stock")],
+        'rating': [(str(rating), f"{rating} star{'s' if rating > 1 else ''} and up") for rating in RATINGS],
+        'accessories': [('1', "Has accessories")],
+    }
+
+
+class FacetIndex:
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.bands = price_bands()
+        self.sets = {}
+        self.toys = {}
+
+    def facet_keys(self, row):
+        """The ``(facet, value)`` pairs toy ``row`` belongs to."""
+        keys = []
+        for key, label, low, high in self.bands:
+            if (low is None or row['price'] >= low) and (high is None or row['price'] < high):
+                keys.append(('price', key))
+        if row['stock'] > 0:
+            keys.append(('in_stock', '1'))
+        for rating in RATINGS:
+            if row['rating'] is not None and row['rating'] >= rating:
+                keys.append(('rating', str(rating)))
+        if row['accessory_count']:
+            keys.append(('accessories', '1'))
+        return keys
+
+    def load(self, toy_ids=None):
+        """(Re)index ``toy_ids``, or every toy; toys that no longer exist are dropped."""
+        toys = Toy.objects.all()
+        if toy_ids is not None:
+            toys = toys.filter(id__in=toy_ids)
+            for toy_id in toy_ids:
+                for key in self.toys.pop(toy_id, ()):
+                    self.sets[key].discard(toy_id)
+        rows = toys.order_by().annotate(
+            rating=Avg('reviews__rating'), accessory_count=Count('accessories', distinct=True),
+        ).values('id', 'price', 'stock', 'rating', 'accessory_count')
+        for row in rows:
+            keys = self.facet_keys(row)
+            self.toys[row['id']] = keys
+            for key in keys:
+                self.sets.setdefault(key, set()).add(row['id'])
+
+    def matching(self, selected, skip=None):
+        """Ids of the toys matching every ``(facet, value)`` in ``selected`` except facet ``skip``."""
+        sets = [self.sets.get(key, set()) for key in selected if key[0] != skip]
+        if not sets:
+            return set(self.toys)
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+    def facets(self, selected):
+        """
+        ``[(label, [(label, count, active, url)])]`` groups for the browse
+        sidebar. A value's count is the number of toys it would leave given
+        the selections in the other facets.
+        """
+        options = facet_options(self.bands)
+        selected_values = dict(selected)
+        groups = []
+        for facet in FACET_PARAMS:
+            base = self.matching(selected, skip=facet)
+            groups.append((FACET_LABELS[facet], [
+                (label, len(base & self.sets.get((facet, value), set())), selected_values.get(facet) == value,
+                 facet_url(selected, facet, value))
+                for value, label in options[facet]
+            ]))
+        return groups
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_facet_index():
+    """This process's index, brought up to date with the changes published since it was last used."""
+    global _index
+    version = current_value(VERSION)
+    with _lock:
+        if _index is not None and time.monotonic() - _index.built_at > settings.FACET_INDEX_SECONDS:
+            _index = None
+        if _index is not None and _index.version == version:
+            return _index
+        changes = None
+        if _index is not None and 0 < version - _index.version <= MAX_INCREMENTAL_CHANGES:
+            keys = [CHANGE_KEY.format(v) for v in range(_index.version + 1, version + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) < len(keys) or ALL_TOYS in changes.values():
+                changes = None
+        if changes is None:
+            index = FacetIndex(version)
+            index.load()
+            _index = index
+        else:
+            _index.load(set(changes.values()))
+            _index.version = version
+        return _index
+
+
+def publish(toy_id):
+    """Tell every process's index that ``toy_id`` changed. Call after the change has committed."""
+    cache.set(CHANGE_KEY.format(next_value(VERSION)), toy_id, CHANGE_TIMEOUT)
+
+
+def publish_all():
+    """Make every process rebuild its index, e.g. after a bulk import that fires no signals."""
+    publish(ALL_TOYS)
+
+
+def selected_facets(params):
+    """The valid ``(facet, value)`` selections in the query string; unknown values are ignored."""
+    options = facet_options(price_bands())
+    return [(facet, params[facet]) for facet in FACET_PARAMS
+            if params.get(facet) in {value for value, label in options[facet]}]
+
+
+def facet_url(selected, facet, value):
+    """Query string toggling ``facet=value`` on top of ``selected``."""
+    params = dict(selected)
+    if params.get(facet) == value:
+        del params[facet]
+    else:
+        params[facet] = value
+    return '?' + urlencode(params) if params else '?'
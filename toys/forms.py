@@ -5,6 +5,9 @@ from django.contrib.auth.forms import UserCreationForm
 
 
 class ToyDrawingForm(forms.ModelForm):
+    # Set by static/js/chunked_upload.js when the image was sent in chunks
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = ToyDrawing
         fields = ['name', 'description', 'width', 'height', 'color', 'special_instructions', 'image']  # Include image
@@ -45,8 +48,9 @@ class ToyForm(forms.ModelForm):
 
 
 class AccessoryForm(forms.ModelForm):
-    model = Accessory
-    field = ['toy', 'name', 'description', 'price', 'image', 'stock']
+    class Meta:
+        model = Accessory
+        fields = ['toy', 'name', 'description', 'price', 'image', 'stock']
 
 
 class ReviewForm(forms.ModelForm):
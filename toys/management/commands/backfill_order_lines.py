@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from toys.orders import backfill_order_lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Create line items for orders placed before OrderLine existed, one per ordered drawing at its current price. "
+        "Orders that already have lines are skipped, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, batch_size=500, **options):
+        filled = backfill_order_lines(batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Added line items to {filled} order(s)."))
@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, \
+    teardown_test_environment
+from django.urls import reverse
+
+from toys.models import Toy
+
+PROFILES = [
+    ('database session + ModelBackend', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('cached_db session + CachedModelBackend', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['toys.auth.CachedModelBackend'],
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries and latency per request on catalog pages for anonymous and logged-in visitors, "
+        "with the database session/auth path and with the cached one. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per page and profile.")
+
+    def handle(self, *args, requests=200, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = User.objects.create_user('benchmark', password='benchmark')
+            toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/21241.jpg', stock=5)
+            urls = [reverse('home'), reverse('toy_list'), reverse('toy_details', args=[toy.id])]
+
+            self.stdout.write(f"{'profile':40} {'visitor':10} {'page':14} {'queries':>8} {'auth q':>7} {'ms/req':>8}")
+            for label, overrides in PROFILES:
+                with override_settings(**overrides):
+                    cache.clear()
+                    for visitor in ('anonymous', 'logged in'):
+                        client = Client()
+                        if visitor == 'logged in':
+                            client.force_login(user)
+                        for url in urls:
+                            self.measure(client, url, requests, label, visitor)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def measure(self, client, url, requests, label, visitor):
+        client.get(url)  # warm caches
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(url)
+            elapsed = time.perf_counter() - start
+        auth_queries = sum(1 for q in queries if 'django_session' in q['sql'] or 'auth_user' in q['sql'])
+        self.stdout.write(f"{label:40} {visitor:10} {url:14} {len(queries) / requests:8.1f} "
+                          f"{auth_queries / requests:7.1f} {elapsed / requests * 1000:8.2f}")
@@ -0,0 +1,90 @@
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from toys.models import CartItem, Toy
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cart write throughput with concurrent shoppers under each SQLite profile in SQLITE_PROFILES. "
+        "Every shopper alternates cart API adds and add-to-cart clicks. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent shoppers.")
+        parser.add_argument('--writes', type=int, default=50, help="Cart writes per shopper and profile.")
+
+    def handle(self, *args, threads=8, writes=50, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite.")
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        options = connection.settings_dict['OPTIONS']
+        # Failed writes are counted, not logged with a traceback each
+        request_log = logging.getLogger('django.request')
+        request_log.disabled = True
+        try:
+            users = [User.objects.create(username=f'shopper{i}') for i in range(threads)]
+            toys = [Toy.objects.create(name=f'Toy {i}', description='A toy', price=10, image='toys/21241.jpg', stock=5)
+                    for i in range(20)]
+
+            self.stdout.write(f"{'profile':10} {'writes/s':>9} {'failed':>7} {'p50 ms':>8} {'p99 ms':>8}")
+            for label, profile in settings.SQLITE_PROFILES.items():
+                # Threads open their connections from this same settings dict
+                connection.close()
+                connection.settings_dict['OPTIONS'] = profile
+                CartItem.objects.all().delete()
+                self.measure(label, users, toys, writes)
+        finally:
+            connection.close()
+            connection.settings_dict['OPTIONS'] = options
+            request_log.disabled = False
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def measure(self, label, users, toys, writes):
+        latencies, failures = [], []
+        start_line = threading.Barrier(len(users) + 1)
+
+        def shop(user):
+            client = Client()
+            client.force_login(user)
+            start_line.wait()
+            try:
+                for i in range(writes):
+                    toy = toys[i % len(toys)]
+                    started = time.perf_counter()
+                    try:
+                        if i % 2:
+                            client.get(f'/add_to_cart/toy/{toy.id}/')
+                        else:
+                            client.post('/api/cart/', json.dumps({'operations': [{'op': 'add', 'type': 'toy', 'id': toy.id}]}),
+                                        content_type='application/json')
+                    except Exception as e:
+                        failures.append(e)
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=shop, args=(user,)) for user in users]
+        for worker in workers:
+            worker.start()
+        start_line.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        done = len(latencies) - len(failures)
+        self.stdout.write(f"{label:10} {done / elapsed:9.0f} {len(failures):7} "
+                          f"{latencies[len(latencies) // 2] * 1000:8.1f} {latencies[len(latencies) * 99 // 100] * 1000:8.1f}")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from toys.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the \"customers also bought\" table from item co-occurrence in carts and orders. "
+        "Needs NumPy and SciPy; meant to run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help="Neighbours kept per item (default: RECOMMENDATIONS_TOP_K).")
+        parser.add_argument('--min-count', type=int,
+                            help="Fewest shared baskets for a pair to count (default: RECOMMENDATIONS_MIN_COUNT).")
+
+    def handle(self, *args, top_k=None, min_count=None, **options):
+        start = time.perf_counter()
+        rows = build_recommendations(top_k, min_count)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} recommendation(s) in {time.perf_counter() - start:.1f}s."
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite write-ahead log back into the database file every --interval seconds, so the log stays "
+        "small and requests rarely run a checkpoint themselves. Run it next to the web workers under the tuned "
+        "SQLite profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.SQLITE_CHECKPOINT_SECONDS,
+                            help="Seconds between checkpoints.")
+        parser.add_argument('--mode', choices=MODES, default='PASSIVE',
+                            help="PASSIVE never blocks writers; TRUNCATE also shrinks the log file to zero.")
+        parser.add_argument('--once', action='store_true', help="Checkpoint once and exit.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"{options['database']} is not an SQLite database.")
+
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA wal_checkpoint({options['mode']})")
+                busy, log_pages, checkpointed = cursor.fetchone()
+            if log_pages < 0:
+                raise CommandError("The database is not in WAL mode; set SQLITE_PROFILE=tuned.")
+            if options['once'] or options['verbosity'] > 1:
+                state = "partial, a writer held the lock" if busy else "done"
+                self.stdout.write(f"Checkpointed {checkpointed} of {log_pages} log page(s) ({state}).")
+            if options['once']:
+                return
+            # Don't hold a connection (and its WAL read snapshot) while sleeping
+            connection.close()
+            time.sleep(options['interval'])
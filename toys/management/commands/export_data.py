@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from toys.exports import EXPORT_FORMATS, EXPORTS, export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream every drawing, order or review to CSV or JSON Lines without loading them into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', dest='export_format')
+        parser.add_argument('--output', help="File to write to (default: standard output).")
+
+    def handle(self, *args, name, export_format='csv', output=None, **options):
+        lines = export_lines(name, export_format)
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = -1 if export_format == 'csv' else 0  # the CSV header is not a row
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        self.stderr.write(self.style.SUCCESS(f"Exported {count} {name} to {output}."))
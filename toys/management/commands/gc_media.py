@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from toys.mediafiles import collect_garbage, reconcile_media, rehash_media
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored media files that no row references any more, in batches. "
+        "Meant to run periodically, e.g. daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=settings.MEDIA_GC_GRACE_HOURS,
+                            help="Keep files stored or referenced less than this many hours ago.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Files checked and deleted per batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted.")
+        parser.add_argument('--reconcile', action='store_true',
+                            help="First recount all references and register files found under MEDIA_ROOT.")
+        parser.add_argument('--rehash', action='store_true',
+                            help="First move files saved before content addressing to content-derived names.")
+
+    def handle(self, *args, grace_hours, batch_size, dry_run, reconcile, rehash, **options):
+        if rehash and not dry_run:
+            self.stdout.write(f"Rehashed {rehash_media()} file reference(s).")
+        if reconcile and not dry_run:
+            self.stdout.write(f"Reconciled reference counts, {reconcile_media()} corrected.")
+        files, size = collect_garbage(grace_hours, batch_size, dry_run)
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {files} unreferenced file(s), {filesizeformat(size)}."))
@@ -0,0 +1,37 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from toys.imagehash import dhash
+from toys.models import ToyDrawing
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the perceptual image hash of drawings that have none yet, e.g. those uploaded before hashing "
+        "was added. Drawings whose image cannot be read are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, batch_size=500, **options):
+        hashed = failed = 0
+        last_id = 0
+        while True:
+            drawings = list(ToyDrawing.objects.filter(id__gt=last_id, image_hash__isnull=True)
+                            .exclude(image='').exclude(image__isnull=True).order_by('id').only('id', 'image')[:batch_size])
+            if not drawings:
+                break
+            last_id = drawings[-1].id
+            for drawing in drawings:
+                try:
+                    with default_storage.open(drawing.image.name) as f:
+                        drawing.image_hash = dhash(f)
+                except OSError as e:
+                    self.stderr.write(f"Drawing {drawing.id}: {e}")
+                    failed += 1
+            # A set-based update: re-saving would reprice and fire the model signals
+            ToyDrawing.objects.bulk_update([drawing for drawing in drawings if drawing.image_hash is not None],
+                                           ['image_hash'])
+            hashed += sum(1 for drawing in drawings if drawing.image_hash is not None)
+        self.stdout.write(self.style.SUCCESS(f"Hashed {hashed} drawing(s), {failed} unreadable."))
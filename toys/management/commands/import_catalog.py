@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from toys.catalog import CatalogError, clean_row, import_batch, read_rows
+from toys.facets import publish_all
+from toys.models import Accessory, Toy
+
+
+class Command(BaseCommand):
+    help = (
+        "Import toys and accessories from a CSV (with a header) or JSON Lines file, upserting by SKU. "
+        "Columns: type (toy/accessory), sku, name, description, price, stock, image (a path inside --images) "
+        "and, for accessories, toy (the toy's SKU)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file; .jsonl for JSON Lines, anything else is read as CSV.")
+        parser.add_argument('--images', required=True, help="Directory the image paths are relative to.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8, help="Threads copying and hashing images.")
+
+    def handle(self, *args, path, images, batch_size=500, workers=8, **options):
+        start = time.perf_counter()
+        rows = {'toy': [], 'accessory': []}
+        errors = []
+        try:
+            for line, row in read_rows(path):
+                try:
+                    item_type, values = clean_row(row)
+                except CatalogError as e:
+                    errors.append((line, str(e)))
+                    continue
+                rows[item_type].append((line, item_type, values))
+        except OSError as e:
+            raise CommandError(e)
+
+        imported = {}
+        imported['toy'] = self.import_rows(Toy, rows['toy'], images, batch_size, workers, errors)
+        # Toys referenced by accessories, whether imported now or already in the catalog
+        toy_skus = {values['toy'] for _, _, values in rows['accessory']}
+        toy_ids = dict(Toy.objects.filter(sku__in=toy_skus).values_list('sku', 'id'))
+        imported['accessory'] = self.import_rows(Accessory, rows['accessory'], images, batch_size, workers, errors,
+                                                 toy_ids)
+
+        # Bulk upserts fire no signals
+        publish_all()
+
+        for line, message in sorted(errors):
+            self.stderr.write(f"Line {line}: {message}")
+        elapsed = time.perf_counter() - start
+        total = imported['toy'] + imported['accessory']
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported['toy']} toy(s) and {imported['accessory']} accessory(ies) in {elapsed:.1f}s "
+            f"({total / elapsed if elapsed else 0:.0f} rows/s), {len(errors)} error(s)."
+        ))
+
+    def import_rows(self, model, rows, images, batch_size, workers, errors, toy_ids=None):
+        count = 0
+        for i in range(0, len(rows), batch_size):
+            imported, batch_errors = import_batch(model, rows[i:i + batch_size], images, workers, toy_ids)
+            count += imported
+            errors += batch_errors
+        return count
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from toys.models import CartRequest
+
+
+class Command(BaseCommand):
+    help = "Delete stored cart API responses older than the idempotency window."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.CART_REQUEST_KEY_EXPIRY_HOURS,
+                            help="Delete responses stored more than this many hours ago.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        count, _ = CartRequest.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} stored cart response(s)."))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from toys.models import ChunkedUpload
+from toys.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked drawing uploads that were never finished, along with their partial files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.CHUNKED_UPLOAD_EXPIRY_HOURS,
+                            help="Delete uploads started more than this many hours ago.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        count = 0
+        for upload in ChunkedUpload.objects.filter(created_at__lt=cutoff).iterator():
+            discard_upload(upload)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} expired upload(s)."))
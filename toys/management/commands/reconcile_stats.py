@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from toys.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the operations dashboard counters from the drawing and order tables and fix any drift. "
+        "Meant to run periodically, e.g. hourly from cron."
+    )
+
+    def handle(self, *args, **options):
+        drifted = reconcile_stats()
+        for (group, key), (stored, actual) in sorted(drifted.items()):
+            self.stdout.write(f"{group} {key}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled dashboard counters, {len(drifted)} corrected."))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from toys.models import ToyDrawing
+from toys.pricing import get_price_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ToyDrawing.price from the current pricing table with set-based UPDATEs in primary-key batches. "
+        "Unlike re-saving each drawing, this issues no per-row queries and fires no model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='append', dest='statuses',
+                            help="Only reprice drawings with this status (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would change without writing anything.")
+
+    def handle(self, *args, statuses=None, batch_size=1000, dry_run=False, **options):
+        new_price = get_price_table().expression()
+        drawings = ToyDrawing.objects.all()
+        if statuses:
+            drawings = drawings.filter(status__in=statuses)
+
+        summary = {}
+        changed = 0
+        last_id = 0
+        while True:
+            ids = list(drawings.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            batch = drawings.filter(pk__gte=ids[0], pk__lte=ids[-1]).exclude(price=new_price)
+            last_id = ids[-1]
+
+            if dry_run:
+                rows = (batch.annotate(new_price=new_price).order_by().values('status')
+                        .annotate(count=Count('pk'), old_total=Sum('price'), new_total=Sum(F('new_price'))))
+                for row in rows:
+                    totals = summary.setdefault(row['status'], [0, 0, 0])
+                    totals[0] += row['count']
+                    totals[1] += row['old_total']
+                    totals[2] += row['new_total']
+                    changed += row['count']
+            else:
+                with transaction.atomic():
+                    changed += batch.update(price=new_price)
+
+        if dry_run:
+            for status, (count, old_total, new_total) in sorted(summary.items()):
+                self.stdout.write(f"{status}: {count} drawing(s), total ${old_total:.2f} -> ${new_total:.2f} "
+                                  f"({new_total - old_total:+.2f})")
+            self.stdout.write(self.style.SUCCESS(f"Dry run: {changed} drawing(s) would be repriced."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repriced {changed} drawing(s)."))
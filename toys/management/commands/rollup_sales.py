@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from toys.sales import rollup_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the daily sales rollups from the last rolled-up day (minus SALES_ROLLUP_LOOKBACK_DAYS) to today. "
+        "Safe to re-run; meant to run periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help="Rebuild the rollups from this day (YYYY-MM-DD) instead of the high-water mark.")
+
+    def handle(self, *args, since=None, **options):
+        days = rollup_sales(since)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {days} day(s) of sales."))
@@ -0,0 +1,135 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    Read-only view over ``length`` bytes of an open file starting at ``start``.
+
+    It keeps ``fileno()`` so WSGI servers with ``wsgi.file_wrapper`` (gunicorn)
+    still use ``sendfile``: they start at the current file offset and stop at
+    the response Content-Length. Without a file wrapper, ``read`` stops at the
+    end of the range.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def media_path(name):
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    return path
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single ``bytes=`` range, ``None``
+    if the header should be ignored and the full file served, or raise
+    ``ValueError`` if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: serving the full body is always valid.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError
+    return start, min(end, size - 1)
+
+
+def send_media(request, name, public=False):
+    """
+    Send the file stored under ``name`` in MEDIA_ROOT.
+
+    When MEDIA_SENDFILE_BACKEND is configured the transfer is handed to the
+    front proxy and Python never reads the file. Otherwise a ``FileResponse``
+    is returned that honours ``Range`` and conditional GETs.
+    """
+    path = media_path(name)
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    cache_control = 'public, max-age=86400' if public else 'private, max-age=3600'
+    backend = settings.MEDIA_SENDFILE_BACKEND
+
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + name)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+            response['Cache-Control'] = cache_control
+            return response
+        response = _file_response(request, path, stat, content_type)
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _file_response(request, path, stat, content_type):
+    size = stat.st_size
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (not if_range or if_range == http_date(stat.st_mtime)):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = FileResponse(FileRange(open(path, 'rb'), start, length),
+                                    content_type=content_type, status=206)
+            response['Content-Length'] = length
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return response
+    return FileResponse(open(path, 'rb'), content_type=content_type)
@@ -0,0 +1,223 @@
+"""
+Reference counting and garbage collection for ContentAddressedStorage.
+
+MediaFile has one row per stored file with the number of rows whose file
+fields point at it. Saving and deleting those rows adjusts the counts in
+the same transaction (toys/signals.py); the storage registers every file it
+writes with a count of 0, so uploads whose row was never saved are found
+too.
+
+Writes that fire no signals (bulk_create in import_catalog, queryset.update())
+leave the counts short, so ``collect_garbage`` only takes a count of 0 as a
+hint: it checks each batch of candidates against the file fields before
+purging anything, and corrects the counts it finds wrong.
+``reconcile_media`` recounts everything and registers files found on disk.
+"""
+import os
+import re
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MediaFile
+
+CONTENT_NAME_RE = re.compile(r'(^|/)[0-9a-f]{64}(\.\w+)?$')
+
+
+def file_fields():
+    """``[(model, field name)]`` for every file field in the toys app."""
+    return [
+        (model, field.name)
+        for model in apps.get_app_config('toys').get_models()
+        for field in model._meta.concrete_fields if isinstance(field, models.FileField)
+    ]
+
+
+def register(name, size):
+    """
+    Record a stored file, keeping its reference count; it is safe from GC for
+    MEDIA_GC_GRACE_HOURS. A single statement, as import_catalog calls it from
+    several threads at once.
+    """
+    now = timezone.now()
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        if not MediaFile.objects.filter(name=name).update(size=size, updated_at=now):
+            try:
+                with transaction.atomic():
+                    MediaFile.objects.create(name=name, size=size, updated_at=now)
+            except IntegrityError:
+                MediaFile.objects.filter(name=name).update(size=size, updated_at=now)
+        return
+
+    table = connection.ops.quote_name(MediaFile._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} (name, size, reference_count, updated_at) VALUES (%s, %s, 0, %s) '
+        f'ON CONFLICT (name) DO UPDATE SET size = excluded.size, updated_at = excluded.updated_at'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [name, size, now])
+
+
+def adjust_references(deltas):
+    """
+    Apply ``{name: delta}`` to the reference counts with a single
+    ``INSERT ... ON CONFLICT DO UPDATE``, in the caller's transaction.
+    """
+    now = timezone.now()
+    rows = [(name, delta, now) for name, delta in deltas.items() if name and delta]
+    if not rows:
+        return
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for name, delta, now in rows:
+            adjust_reference(name, delta, now)
+        return
+
+    table = connection.ops.quote_name(MediaFile._meta.db_table)
+    values = ', '.join(['(%s, 0, %s, %s)'] * len(rows))
+    sql = (
+        f'INSERT INTO {table} (name, size, reference_count, updated_at) VALUES {values} '
+        f'ON CONFLICT (name) DO UPDATE SET reference_count = {table}.reference_count + excluded.reference_count, '
+        f'updated_at = excluded.updated_at'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def adjust_reference(name, delta, now):
+    """Portable fallback for adjust_references."""
+    media_file = MediaFile.objects.filter(name=name)
+    if media_file.update(reference_count=F('reference_count') + delta, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, reference_count=delta, updated_at=now)
+    except IntegrityError:
+        media_file.update(reference_count=F('reference_count') + delta, updated_at=now)
+
+
+def reference_deltas(instance, previous=None, sign=1):
+    """Count changes for ``instance``'s files replacing ``previous`` (``{field: name}``), or leaving if sign=-1."""
+    deltas = Counter()
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            name = getattr(instance, field.attname).name or ''
+            old = (previous or {}).get(field.attname) or ''
+            if name != old:
+                deltas[name] += sign
+                deltas[old] -= sign
+    return deltas
+
+
+def count_references(names=None):
+    """``Counter(name -> rows)`` over every file field, for ``names`` or for all files."""
+    counts = Counter()
+    for model, field in file_fields():
+        rows = model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        if names is not None:
+            rows = rows.filter(**{f'{field}__in': names})
+        counts.update(rows.values_list(field, flat=True).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE))
+    return counts
+
+
+def collect_garbage(grace_hours=None, batch_size=500, dry_run=False):
+    """
+    Purge stored files no row references that have not been touched for
+    ``grace_hours``, ``batch_size`` at a time. Returns ``(files, bytes)``
+    purged, or that would be with ``dry_run``.
+    """
+    grace_hours = settings.MEDIA_GC_GRACE_HOURS if grace_hours is None else grace_hours
+    cutoff = timezone.now() - timedelta(hours=grace_hours)
+    purged = purged_bytes = 0
+    last_id = 0
+    while True:
+        batch = list(MediaFile.objects.filter(reference_count__lte=0, updated_at__lt=cutoff, id__gt=last_id)
+                     .order_by('id')[:batch_size])
+        if not batch:
+            return purged, purged_bytes
+        last_id = batch[-1].id
+
+        counts = count_references([media_file.name for media_file in batch])
+        orphans = [media_file for media_file in batch if not counts[media_file.name]]
+        for media_file in batch:
+            if counts[media_file.name]:
+                MediaFile.objects.filter(id=media_file.id).update(reference_count=counts[media_file.name])
+        if dry_run:
+            purged += len(orphans)
+            purged_bytes += sum(media_file.size for media_file in orphans)
+            continue
+
+        with transaction.atomic():
+            # Only rows still unreferenced and untouched: a save since the check above keeps its file
+            gone = set(MediaFile.objects.select_for_update().filter(
+                id__in=[media_file.id for media_file in orphans], reference_count__lte=0, updated_at__lt=cutoff,
+            ).values_list('id', flat=True))
+            MediaFile.objects.filter(id__in=gone).delete()
+        for media_file in orphans:
+            if media_file.id in gone:
+                default_storage.purge(media_file.name)
+                purged += 1
+                purged_bytes += media_file.size
+
+
+def stored_files():
+    """``{name: size}`` for every file under MEDIA_ROOT."""
+    files = {}
+    for root, _, filenames in os.walk(settings.MEDIA_ROOT):
+        for filename in filenames:
+            if filename.startswith('.') and filename.endswith('.tmp'):
+                continue
+            path = os.path.join(root, filename)
+            files[os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')] = os.path.getsize(path)
+    return files
+
+
+def reconcile_media():
+    """
+    Recount every reference and register every file on disk. Returns the
+    number of files whose count changed. Unreferenced files found on disk
+    are registered as of now, so they are purged a grace period later.
+    """
+    counts = count_references()
+    files = stored_files()
+    now = timezone.now()
+    with transaction.atomic():
+        stored = dict(MediaFile.objects.select_for_update().values_list('name', 'reference_count'))
+        changed = [name for name in stored.keys() | counts.keys() | files.keys()
+                   if name not in stored or stored[name] != counts[name]]
+        # updated_at only applies to new rows; existing ones keep their grace period
+        MediaFile.objects.bulk_create([
+            MediaFile(name=name, size=files.get(name, 0), reference_count=counts[name], updated_at=now)
+            for name in changed
+        ], batch_size=500, update_conflicts=True, unique_fields=['name'], update_fields=['size', 'reference_count'])
+    return sum(stored.get(name, 0) != counts[name] for name in changed)
+
+
+def rehash_media():
+    """
+    Move files stored before ContentAddressedStorage to content-derived
+    names and point their rows at them, so duplicates collapse into one
+    file. The old files are left unreferenced for collect_garbage. Returns
+    the number of rows updated.
+    """
+    updated = 0
+    for model, field in file_fields():
+        rows = (model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list('pk', field).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE))
+        renamed = {}
+        for pk, name in rows:
+            if CONTENT_NAME_RE.search(name) or not default_storage.exists(name):
+                continue
+            if name not in renamed:
+                with default_storage.open(name) as f:
+                    renamed[name] = default_storage.save(name, f)
+            with transaction.atomic():
+                if model._base_manager.filter(pk=pk, **{field: name}).update(**{field: renamed[name]}):
+                    adjust_references({renamed[name]: 1, name: -1})
+                    updated += 1
+    return updated
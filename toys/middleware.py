@@ -0,0 +1,35 @@
+from django.conf import settings
+
+from . import warmup
+
+
+class GuestCartMiddleware:
+    """Delete the guest cart cookie once its contents were merged into a user's cart at login."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, 'guest_cart_merged', False):
+            response.delete_cookie(settings.GUEST_CART_COOKIE_NAME, samesite='Lax')
+        return response
+
+
+class WarmUpMiddleware:
+    """
+    Warm the process up when Django loads the middleware, which happens when
+    the WSGI/ASGI application is created, so every server starts warm and
+    /ready/ works without gunicorn.conf.py. Logs the cold start to first
+    response. Keep it first in MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not warmup.is_warm():
+            warmup.warm_up()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        warmup.log_first_response(request)
+        return response
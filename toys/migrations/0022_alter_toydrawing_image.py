@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0021_homepagereview'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='toydrawing',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='customer_drawings/'),
+        ),
+    ]
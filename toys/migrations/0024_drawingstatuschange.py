@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('toys', '0023_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrawingStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(max_length=20)),
+                ('new_status', models.CharField(max_length=20)),
+                ('is_approved', models.BooleanField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('drawing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='toys.toydrawing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='toys_drawin_user_id_5a5ec5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('toys', '0024_drawingstatuschange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('response', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='cartrequest',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_cart_request_key'),
+        ),
+    ]
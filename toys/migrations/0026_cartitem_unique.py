@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:24
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    # Fold duplicate lines into the oldest one, summing their quantities
+    CartItem = apps.get_model('toys', 'CartItem')
+    duplicates = (CartItem.objects.values('cart', 'content_type', 'object_id')
+                  .annotate(lines=Count('id'), first_id=Min('id'), total=Sum('quantity'))
+                  .filter(lines__gt=1))
+    for duplicate in list(duplicates):
+        CartItem.objects.filter(id=duplicate['first_id']).update(quantity=duplicate['total'])
+        CartItem.objects.filter(
+            cart=duplicate['cart'], content_type=duplicate['content_type'], object_id=duplicate['object_id'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0025_cartrequest'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'content_type', 'object_id'), name='unique_cart_item'),
+        ),
+    ]
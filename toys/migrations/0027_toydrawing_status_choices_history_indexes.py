@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0026_cartitem_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='toydrawing',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('in_progress', 'In Progress'), ('completed', 'Completed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='toydrawing',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='toys_toydra_user_id_60ee47_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toydrawing',
+            index=models.Index(fields=['user', 'created_at'], name='toys_toydra_user_id_2a7000_idx'),
+        ),
+    ]
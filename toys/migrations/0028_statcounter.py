@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0027_toydrawing_status_choices_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'operations dashboard',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statcounter',
+            constraint=models.UniqueConstraint(fields=('group', 'key'), name='unique_stat_counter'),
+        ),
+    ]
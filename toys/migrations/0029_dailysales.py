@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:32
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0028_statcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(max_length=20)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('drawings_submitted', models.PositiveIntegerField(default=0)),
+                ('drawings_approved', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='drawingstatuschange',
+            index=models.Index(fields=['created_at'], name='toys_drawin_created_872cf4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toydrawing',
+            index=models.Index(fields=['created_at'], name='toys_toydra_created_56aa34_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyitemsales',
+            name='day',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='toys.dailysales'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyitemsales',
+            constraint=models.UniqueConstraint(fields=('day', 'item_type'), name='unique_daily_item_sales'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0029_dailysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessory',
+            name='sku',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='toy',
+            name='sku',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+    ]
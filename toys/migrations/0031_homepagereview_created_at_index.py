@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0030_catalog_sku'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='homepagereview',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
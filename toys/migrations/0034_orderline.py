@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0033_mediafile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('toy', 'Toy'), ('accessory', 'Accessory'), ('drawing', 'Drawing')], max_length=20)),
+                ('item_id', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='toys.order')),
+            ],
+        ),
+    ]
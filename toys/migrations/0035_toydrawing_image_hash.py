@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0034_orderline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='toydrawing',
+            name='image_hash',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
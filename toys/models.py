@@ -1,13 +1,20 @@
+import uuid
 from decimal import Decimal
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .imagehash import dhash
+from .pricing import DEFAULT_BASE_PRICE, drawing_price
+
 STATUS_CHOICES = [
     ('pending', 'Pending'),
     ('approved', 'Approved'),
     ('rejected', 'Rejected'),
+    ('in_progress', 'In Progress'),
+    ('completed', 'Completed'),
 ]
 
 
@@ -15,28 +22,64 @@ class ToyDrawing(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     description = models.TextField()
-    image = models.ImageField(upload_to='customer_drawings/', blank=True, null=True)
+    image = models.ImageField(upload_to='customer_drawings/', blank=True, null=True, db_index=True)
+    # Perceptual hash of the image, for spotting resubmissions (see toys/duplicates.py)
+    image_hash = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
     width = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('10.00'))
     height = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('10.00'))
-    base_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('20.00'))
+    base_price = models.DecimalField(max_digits=10, decimal_places=2, default=DEFAULT_BASE_PRICE)
     price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
     color = models.CharField(max_length=50, blank=True)
     special_instructions = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, default='pending')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     is_approved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Drawing history pages: newest first, optionally filtered by status
+            models.Index(fields=['user', 'status', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
     def save(self, *args, **kwargs):
         # Calculate the price based on the drawing's area
-        base_area = Decimal('100.00')  # Base area of 10x10 cm
-        drawing_area = self.width * self.height
-        self.price = (drawing_area / base_area) * self.base_price
+        self.price = drawing_price(self.width, self.height, self.base_price)
+        # Hash a newly uploaded image before it is written to storage
+        if not self.image:
+            self.image_hash = None
+        elif not self.image._committed:
+            try:
+                self.image_hash = dhash(self.image)
+            except OSError:
+                self.image_hash = None
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
+class DrawingStatusChange(models.Model):
+    # Append-only: rows are only ever added, by toys.status.change_status
+    drawing = models.ForeignKey(ToyDrawing, related_name='status_changes', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # the drawing's owner, for per-user feeds
+    old_status = models.CharField(max_length=20)
+    new_status = models.CharField(max_length=20)
+    is_approved = models.BooleanField()
+    changed_by = models.ForeignKey(User, related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.drawing_id}: {self.old_status} -> {self.new_status}"
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
 
@@ -45,6 +88,7 @@ class Cart(models.Model):
 
 
 class Toy(models.Model):
+    sku = models.CharField(max_length=50, unique=True, null=True, blank=True)  # natural key for import_catalog
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -62,11 +106,33 @@ class CartItem(models.Model):
     item = GenericForeignKey('content_type', 'object_id')
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'content_type', 'object_id'], name='unique_cart_item'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} of {self.item}"
 
 
+class CartRequest(models.Model):
+    # Response of a cart API call, replayed when the client retries with the same Idempotency-Key
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_cart_request_key'),
+        ]
+
+    def __str__(self):
+        return f"Cart request {self.key} by {self.user_id}"
+
+
 class Accessory(models.Model):
+    sku = models.CharField(max_length=50, unique=True, null=True, blank=True)  # natural key for import_catalog
     toy = models.ForeignKey(Toy, related_name='accessories', on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -104,19 +170,144 @@ class Order(models.Model):
     items = models.ManyToManyField(ToyDrawing)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, default='pending')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     payment_status = models.CharField(max_length=20, default='unpaid')
 
     def __str__(self):
         return f"Order{self.id} by {self.user.name}"
 
 
+ORDER_ITEM_TYPES = [
+    ('toy', 'Toy'),
+    ('accessory', 'Accessory'),
+    ('drawing', 'Drawing'),
+]
+
+
+class OrderLine(models.Model):
+    # What was bought, as it was at purchase time; the item itself may change or be deleted later
+    order = models.ForeignKey(Order, related_name='lines', on_delete=models.CASCADE)
+    item_type = models.CharField(max_length=20, choices=ORDER_ITEM_TYPES)
+    item_id = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+
+    @property
+    def subtotal(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.name}"
+
+
 class HomepageReview(models.Model):
     customer_name = models.CharField(max_length=250)
     email = models.EmailField()
     review_TEXT = models.TextField()
     image = models.ImageField(upload_to='homepage_review/', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"review by {self.customer_name}"
+
+
+class ChunkedUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"review by {self.customer_name}"
\ No newline at end of file
+        return f"Upload {self.id} of {self.filename}"
+
+
+class StatCounter(models.Model):
+    # Running totals behind the admin operations dashboard, kept by toys.stats
+    group = models.CharField(max_length=20)
+    key = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'key'], name='unique_stat_counter'),
+        ]
+        verbose_name_plural = 'operations dashboard'
+
+    def __str__(self):
+        return f"{self.group} {self.key}: {self.value}"
+
+
+class DailySales(models.Model):
+    # Daily rollups written by manage.py rollup_sales; reports read only these
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    drawings_submitted = models.PositiveIntegerField(default=0)
+    drawings_approved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"Sales on {self.date}"
+
+
+class DailyItemSales(models.Model):
+    day = models.ForeignKey(DailySales, related_name='items', on_delete=models.CASCADE)
+    item_type = models.CharField(max_length=20)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'item_type'], name='unique_daily_item_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_type} sales on {self.day_id}"
+
+
+class Recommendation(models.Model):
+    # "Customers also bought": the top neighbours of each item, rebuilt by manage.py build_recommendations
+    content_type = models.ForeignKey(ContentType, related_name='+', on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    neighbour_type = models.ForeignKey(ContentType, related_name='+', on_delete=models.CASCADE)
+    neighbour_id = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type_id}:{self.object_id} -> {self.neighbour_type_id}:{self.neighbour_id}"
+
+
+class MediaFile(models.Model):
+    # A file in ContentAddressedStorage and the number of rows using it, kept by toys.mediafiles
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    reference_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reference_count', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.reference_count} references)"
+
+
+class Sequence(models.Model):
+    # A counter that only goes up, numbering the cache changelogs; kept by toys.sequences
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
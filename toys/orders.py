@@ -0,0 +1,94 @@
+"""
+Orders and their line items.
+
+Each OrderLine snapshots an item as it was bought: type and id, name, unit
+price and quantity. Order history, totals and the sales rollups read the
+lines alone, so they neither join the catalog nor change when a toy is
+repriced or deleted.
+
+Placing an order empties the cart. If the customer never pays (Stripe
+fails, or they cancel on its page), ``restore_cart`` puts the lines back
+and deletes the unpaid order.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count
+
+from .cart import CART_ITEM_TYPES, add_cart_items
+from .models import Cart, CartItem, Order, OrderLine
+
+UNPAID_STATUS = 'unpaid'
+
+ITEM_TYPE_NAMES = {model: item_type for item_type, model in CART_ITEM_TYPES.items()}
+
+
+def place_order(user):
+    """
+    Turn ``user``'s cart into an unpaid order with one line per cart item
+    and empty the cart. Returns the order, or None if the cart is empty.
+    """
+    with transaction.atomic():
+        cart_items = [cart_item for cart_item in
+                      CartItem.objects.select_for_update().filter(cart__user=user).prefetch_related('item')
+                      if cart_item.item is not None]
+        if not cart_items:
+            return None
+        lines = [
+            OrderLine(item_type=ITEM_TYPE_NAMES[type(cart_item.item)], item_id=cart_item.object_id,
+                      name=cart_item.item.name, unit_price=cart_item.item.price, quantity=cart_item.quantity)
+            for cart_item in cart_items
+        ]
+        order = Order.objects.create(user=user, total_price=sum(line.subtotal for line in lines))
+        for line in lines:
+            line.order = order
+        OrderLine.objects.bulk_create(lines)
+        order.items.add(*[line.item_id for line in lines if line.item_type == 'drawing'])
+        CartItem.objects.filter(id__in=[cart_item.id for cart_item in cart_items]).delete()
+    return order
+
+
+def restore_cart(user, order_id):
+    """
+    Move the lines of ``user``'s unpaid order ``order_id`` back into their cart
+    and delete the order. Items removed from the catalog since are dropped.
+    Returns False if there is no such unpaid order.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(id=order_id, user=user, payment_status=UNPAID_STATUS).first()
+        if order is None:
+            return False
+        content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+        lines = list(order.lines.all())
+        rows = []
+        for item_type, model in CART_ITEM_TYPES.items():
+            typed = [line for line in lines if line.item_type == item_type]
+            items = model.objects.filter(user=user) if item_type == 'drawing' else model.objects
+            existing = items.in_bulk([line.item_id for line in typed])
+            rows += [(content_types[model].id, line.item_id, line.quantity) for line in typed if line.item_id in existing]
+        cart, created = Cart.objects.get_or_create(user=user)
+        add_cart_items(cart, rows)
+        order.delete()
+    return True
+
+
+def backfill_order_lines(batch_size=500):
+    """
+    Give orders placed before OrderLine existed one line per ordered drawing,
+    at the drawing's current price. Orders that already have lines are left
+    alone, so it can be re-run. Returns the number of orders filled in.
+    """
+    filled = 0
+    last_id = 0
+    while True:
+        orders = list(Order.objects.filter(id__gt=last_id).annotate(line_count=Count('lines'))
+                      .filter(line_count=0).order_by('id').prefetch_related('items')[:batch_size])
+        if not orders:
+            return filled
+        last_id = orders[-1].id
+        with transaction.atomic():
+            OrderLine.objects.bulk_create([
+                OrderLine(order=order, item_type='drawing', item_id=drawing.id, name=drawing.name,
+                          unit_price=drawing.price, quantity=1)
+                for order in orders for drawing in order.items.all()
+            ])
+        filled += sum(1 for order in orders if order.items.all())
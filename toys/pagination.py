@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(created_at, pk):
+    value = f'{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, pk)`` from a cursor, or ``None`` if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = value.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        return None
+
+
+def keyset_page(queryset, cursor, per_page, field='created_at'):
+    """
+    Return one page of ``queryset``, newest ``field`` first, and the cursor for
+    the next page (``None`` on the last page).
+
+    The page starts strictly after the row encoded in ``cursor`` instead of at
+    an OFFSET, so every page is an index range scan no matter how deep it is,
+    and rows added meanwhile do not shift later pages.
+    """
+    queryset = queryset.order_by(f'-{field}', '-pk')
+    position = decode_cursor(cursor)
+    if position:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+
+    objects = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(objects) > per_page:
+        last = objects[per_page - 1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return objects[:per_page], next_cursor
@@ -0,0 +1,15 @@
+import functools
+
+from django.conf import settings
+
+
+@functools.lru_cache(maxsize=None)
+def get_stripe():
+    """
+    The configured ``stripe`` module. It takes longer to import than the rest
+    of the app together, so it is only loaded by the first payment request.
+    """
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
@@ -0,0 +1,178 @@
+"""
+Drawing price calculation.
+
+A drawing costs ``base_price`` per 100 cm² (a 10x10 cm drawing), adjusted by a
+size-band table. The table is read from settings.DRAWING_PRICE_TABLE (a JSON
+file) and kept in memory; the file's modification time is checked at most
+every DRAWING_PRICE_TABLE_RELOAD_SECONDS, so edits are picked up without a
+restart. Without a table file every size uses a multiplier of 1.
+
+Example table::
+
+    {
+        "mode": "band",
+        "bands": [
+            {"up_to": 400, "multiplier": "1.00"},
+            {"up_to": 2500, "multiplier": "0.90"},
+            {"up_to": null, "multiplier": "0.80"}
+        ]
+    }
+
+In "band" mode the whole area is priced at the multiplier of the band it falls
+in. In "tiered" mode each band prices only the part of the area inside it.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Greatest, Least, Round
+from django.db.models.lookups import LessThanOrEqual
+
+BASE_AREA = Decimal('100.00')  # Base area of 10x10 cm
+DEFAULT_BASE_PRICE = Decimal('20.00')
+CENT = Decimal('0.01')
+
+logger = logging.getLogger(__name__)
+
+
+class PriceTable:
+    def __init__(self, mode='band', bands=None):
+        if mode not in ('band', 'tiered'):
+            raise ValueError(f"Unknown pricing mode: {mode}")
+        bands = bands or [{'up_to': None, 'multiplier': '1'}]
+        self.mode = mode
+        self.bands = [
+            (None if band.get('up_to') is None else Decimal(str(band['up_to'])), Decimal(str(band['multiplier'])))
+            for band in bands
+        ]
+        if self.bands[-1][0] is not None:
+            raise ValueError("The last price band must have no upper bound.")
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data.get('mode', 'band'), data.get('bands'))
+
+    def price(self, width, height, base_price=DEFAULT_BASE_PRICE):
+        area = Decimal(width) * Decimal(height)
+        rate = Decimal(base_price) / BASE_AREA
+
+        if self.mode == 'band':
+            multiplier = next(m for up_to, m in self.bands if up_to is None or area <= up_to)
+            price = area * rate * multiplier
+        else:
+            price, lower = Decimal(0), Decimal(0)
+            for up_to, multiplier in self.bands:
+                upper = area if up_to is None else min(area, up_to)
+                if upper > lower:
+                    price += (upper - lower) * rate * multiplier
+                if up_to is None or area <= up_to:
+                    break
+                lower = up_to
+        return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+    def expression(self):
+        """
+        The same price as an ORM expression over ToyDrawing's width, height and
+        base_price columns, so prices can be recomputed in a single UPDATE.
+        """
+        # Multipliers are pre-divided by the base area so the SQL never divides:
+        # SQLite stores whole-number decimals as integers and would truncate.
+        area = F('width') * F('height')
+        per_cm2 = [(up_to, _decimal(multiplier / BASE_AREA)) for up_to, multiplier in self.bands]
+
+        if self.mode == 'band':
+            whens = [When(LessThanOrEqual(area, _decimal(up_to)), then=rate) for up_to, rate in per_cm2[:-1]]
+            rate = Case(*whens, default=per_cm2[-1][1]) if whens else per_cm2[-1][1]
+            price = area * F('base_price') * rate
+        else:
+            price, lower = None, Decimal(0)
+            for up_to, rate in per_cm2:
+                upper = area if up_to is None else Least(area, _decimal(up_to))
+                part = Greatest(upper - _decimal(lower), _decimal(0)) * F('base_price') * rate
+                price = part if price is None else price + part
+                lower = up_to
+        return ExpressionWrapper(Round(price, 2), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def _decimal(value):
+    return Value(value, output_field=DecimalField())
+
+
+_lock = threading.Lock()
+_table = PriceTable()
+_table_mtime = None
+_checked_at = 0.0
+
+
+def get_price_table():
+    global _table, _table_mtime, _checked_at
+
+    now = time.monotonic()
+    if now - _checked_at < settings.DRAWING_PRICE_TABLE_RELOAD_SECONDS:
+        return _table
+    with _lock:
+        _checked_at = now
+        path = settings.DRAWING_PRICE_TABLE
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except FileNotFoundError:
+            mtime = None
+        if mtime != _table_mtime:
+            try:
+                _table = PriceTable.from_file(path) if mtime is not None else PriceTable()
+            except (OSError, ValueError, KeyError, ArithmeticError):
+                # Keep pricing with the last good table rather than failing requests.
+                logger.exception("Could not load drawing price table %s", path)
+            _table_mtime = mtime
+    return _table
+
+
+def reset_price_table():
+    """Force the next price lookup to re-read the table file."""
+    global _checked_at, _table_mtime
+    with _lock:
+        _checked_at = 0.0
+        _table_mtime = -1
+
+
+def drawing_price(width, height, base_price=DEFAULT_BASE_PRICE):
+    return get_price_table().price(width, height, base_price)
+
+
+MAX_DIMENSION = Decimal('999.99')  # ToyDrawing.width/height are max_digits=5, decimal_places=2
+MAX_BASE_PRICE = Decimal('99999999.99')  # ToyDrawing.base_price is max_digits=10, decimal_places=2
+
+
+def quote_request(item):
+    """
+    Price one ``{'width', 'height', 'base_price'}`` mapping from an API request.
+    Raises ``ValueError`` with a user-facing message for invalid input.
+    """
+    values = {}
+    for field, default in (('width', None), ('height', None), ('base_price', DEFAULT_BASE_PRICE)):
+        raw = item.get(field, default)
+        try:
+            value = Decimal(str(raw))
+        except ArithmeticError:
+            raise ValueError(f"'{field}' must be a number.")
+        if not value.is_finite() or value <= 0:
+            raise ValueError(f"'{field}' must be a number greater than zero.")
+        if field == 'base_price' and value > MAX_BASE_PRICE:
+            raise ValueError(f"'{field}' must be at most {MAX_BASE_PRICE}.")
+        if field != 'base_price' and value > MAX_DIMENSION:
+            raise ValueError(f"'{field}' must be at most {MAX_DIMENSION} cm.")
+        values[field] = value
+
+    return {
+        'width': str(values['width']),
+        'height': str(values['height']),
+        'base_price': str(values['base_price']),
+        'price': str(drawing_price(values['width'], values['height'], values['base_price'])),
+    }
@@ -0,0 +1,141 @@
+"""
+Token-bucket rate limiting for expensive views.
+
+Each policy in RATE_LIMITS is a bucket of ``burst`` tokens refilled at
+``rate``, kept per user (or per client IP for anonymous visitors). Buckets
+are stored GCRA-style as a single integer in the cache: the time at which
+the bucket will be full again. A request adds one token's worth of time
+with an atomic ``cache.incr`` and is allowed if that time is at most
+``burst`` tokens ahead of now; otherwise the increment is undone and the
+client gets a 429 with Retry-After.
+
+Limits only hold across workers with a shared cache that increments
+atomically (Redis, Memcached). Other backends implement ``incr`` as a get
+and a set that resets the key's timeout to the default, so every increment
+here is followed by a ``touch`` restoring the intended one, and
+``check_cache`` warns at startup that the limits are only approximate.
+Allowed and limited requests are counted per policy in the cache for the
+operations dashboard.
+"""
+import functools
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Cache backends whose incr is atomic across processes
+ATOMIC_INCR_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+STATS_TIMEOUT = 7 * 86400
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> milliseconds between tokens."""
+    count, period = rate.split('/')
+    return PERIODS[period] * 1000 // int(count)
+
+
+def check_cache():
+    """Warn if rate limits are enabled on a cache that can't increment atomically. Returns whether it can."""
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.RATE_LIMIT_ENABLED or backend in ATOMIC_INCR_BACKENDS:
+        return True
+    logger.warning("Rate limits are approximate: the %s cache doesn't increment atomically, so concurrent requests "
+                   "can take the same token. Set REDIS_URL to enforce them exactly.", backend)
+    return False
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if settings.RATE_LIMIT_IP_HEADER:
+        # e.g. X-Forwarded-For set by our own proxy: the last address is the one it saw
+        forwarded = request.META.get(settings.RATE_LIMIT_IP_HEADER, '')
+        if forwarded:
+            return 'ip:' + forwarded.split(',')[-1].strip()
+    return 'ip:' + request.META.get('REMOTE_ADDR', '')
+
+
+def take_token(scope, client):
+    """Take a token from ``client``'s ``scope`` bucket. Returns 0 if allowed, else seconds until it would be."""
+    policy = settings.RATE_LIMITS[scope]
+    interval = parse_rate(policy['rate'])
+    capacity = policy['burst'] * interval
+    key = f'ratelimit:{scope}:{client}'
+    timeout = math.ceil(capacity / 1000) + 1
+    now = int(time.time() * 1000)
+
+    if cache.add(key, now + interval, timeout):
+        return 0
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at - interval < now:
+        # The bucket had refilled completely; restart it from now. Concurrent requests at this
+        # moment may each reset it, which can only let a few more through, never fewer.
+        full_at = now + interval
+        cache.set(key, full_at, timeout)
+    if full_at - now <= capacity:
+        cache.touch(key, timeout)
+        return 0
+    cache.decr(key, interval)
+    cache.touch(key, timeout)
+    return math.ceil((full_at - now - capacity) / 1000)
+
+
+def count(scope, outcome):
+    key = f'ratelimit:stats:{scope}:{outcome}'
+    cache.add(key, 0, STATS_TIMEOUT)
+    try:
+        cache.incr(key)
+        cache.touch(key, STATS_TIMEOUT)
+    except ValueError:
+        cache.set(key, 1, STATS_TIMEOUT)
+
+
+def rate_limit_stats():
+    """``[(scope, allowed, limited)]`` for every policy, from the cache."""
+    keys = [f'ratelimit:stats:{scope}:{outcome}' for scope in settings.RATE_LIMITS for outcome in ('allowed', 'limited')]
+    values = cache.get_many(keys)
+    return [
+        (scope, values.get(f'ratelimit:stats:{scope}:allowed', 0), values.get(f'ratelimit:stats:{scope}:limited', 0))
+        for scope in settings.RATE_LIMITS
+    ]
+
+
+def rate_limit(scope, methods=('POST',), when=None):
+    """
+    Limit a view with the RATE_LIMITS[scope] policy. Only requests with one
+    of ``methods``, and for which ``when(request)`` is true if given, take a
+    token. Put it below login_required so users are limited by account
+    rather than by IP.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in methods or not settings.RATE_LIMIT_ENABLED
+                    or (when is not None and not when(request))):
+                return view(request, *args, **kwargs)
+            client = client_key(request)
+            retry_after = take_token(scope, client)
+            if retry_after:
+                count(scope, 'limited')
+                logger.warning("Rate limited %s on %s", client, scope)
+                return HttpResponse("Too many requests, please try again later.", status=429,
+                                    headers={'Retry-After': str(retry_after)})
+            count(scope, 'allowed')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
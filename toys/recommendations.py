@@ -0,0 +1,124 @@
+"""
+"Customers also bought" recommendations.
+
+``build_recommendations`` is a batch job: it turns every cart and order
+into a basket, builds the sparse basket x item matrix B, and computes the
+item x item co-occurrence matrix C = BᵀB with SciPy. Scores are cosine
+similarities (co-occurrences over the geometric mean of the two items'
+basket counts), so best-sellers do not top every list. The top
+RECOMMENDATIONS_TOP_K neighbours of each item are stored in Recommendation,
+so serving is one indexed range scan.
+
+Drawings count as basket items, but only catalog toys and accessories are
+recommended: a drawing is one customer's custom order.
+
+NumPy and SciPy are only needed by the batch job and are imported there.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .cart import CART_ITEM_TYPES
+from .models import CartItem, OrderLine, Recommendation
+
+RECOMMENDED_TYPES = ('toy', 'accessory')
+
+
+def basket_rows():
+    """``(basket, content_type_id, object_id)`` arrays for every cart line and order line."""
+    import numpy as np
+
+    carts = np.array(list(CartItem.objects.values_list('cart_id', 'content_type_id', 'object_id').iterator()),
+                     dtype=np.int64).reshape(-1, 3)
+    content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+    type_ids = {item_type: content_types[model].id for item_type, model in CART_ITEM_TYPES.items()}
+    orders = np.array([
+        (order_id, type_ids[item_type], item_id)
+        for order_id, item_type, item_id in OrderLine.objects.values_list('order_id', 'item_type', 'item_id').iterator()
+    ], dtype=np.int64).reshape(-1, 3)
+
+    # Even basket ids are carts, odd ones orders
+    baskets = np.concatenate([carts[:, 0] * 2, orders[:, 0] * 2 + 1])
+    types = np.concatenate([carts[:, 1], orders[:, 1]])
+    ids = np.concatenate([carts[:, 2], orders[:, 2]])
+    return baskets, types, ids
+
+
+def build_recommendations(top_k=None, min_count=None):
+    """Recompute every item's top neighbours and replace the Recommendation table. Returns the rows written."""
+    import numpy as np
+    from scipy import sparse
+
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    min_count = min_count or settings.RECOMMENDATIONS_MIN_COUNT
+
+    baskets, types, ids = basket_rows()
+    if not len(baskets):
+        Recommendation.objects.all().delete()
+        return 0
+    keys = (types << 32) | ids
+    items, item_index = np.unique(keys, return_inverse=True)
+    _, basket_index = np.unique(baskets, return_inverse=True)
+
+    # Binary basket x item matrix (a quantity of 3 is still one purchase)
+    b = sparse.csr_matrix((np.ones(len(keys), dtype=np.float32), (basket_index, item_index)),
+                          shape=(basket_index.max() + 1, len(items)))
+    b.data[:] = 1
+    item_counts = np.asarray(b.sum(axis=0)).ravel()
+
+    c = (b.T @ b).tocoo()
+    rows, cols, counts = c.row, c.col, c.data
+
+    content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+    recommended = np.array([content_types[CART_ITEM_TYPES[t]].id for t in RECOMMENDED_TYPES], dtype=np.int64)
+    keep = (rows != cols) & (counts >= min_count) & np.isin(items[cols] >> 32, recommended)
+    rows, cols, counts = rows[keep], cols[keep], counts[keep]
+    scores = counts / np.sqrt(item_counts[rows] * item_counts[cols])
+
+    # Rank neighbours within each item by score and keep the first top_k
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    first = np.searchsorted(rows, rows, side='left')
+    keep = np.arange(len(rows)) - first < top_k
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    source, neighbour = items[rows], items[cols]
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        Recommendation.objects.bulk_create((
+            Recommendation(content_type_id=int(s >> 32), object_id=int(s & 0xFFFFFFFF),
+                           neighbour_type_id=int(n >> 32), neighbour_id=int(n & 0xFFFFFFFF), score=float(score))
+            for s, n, score in zip(source, neighbour, scores)
+        ), batch_size=1000)
+    return len(scores)
+
+
+def recommendations(items, limit):
+    """
+    Items recommended alongside ``items`` (``(content_type_id, object_id)``
+    pairs), best first, leaving out ``items`` themselves. One indexed query
+    for the neighbours plus one per recommended item type.
+    """
+    if not items:
+        return []
+    sources = Q()
+    for content_type_id, object_id in items:
+        sources |= Q(content_type_id=content_type_id, object_id=object_id)
+    neighbours = (Recommendation.objects.filter(sources).values_list('neighbour_type_id', 'neighbour_id')
+                  .annotate(total=Sum('score')).order_by('-total')[:limit + len(items)])
+    exclude = set(items)
+    ranked = [(content_type_id, object_id) for content_type_id, object_id, total in neighbours
+              if (content_type_id, object_id) not in exclude][:limit]
+
+    wanted = defaultdict(list)
+    for content_type_id, object_id in ranked:
+        wanted[content_type_id].append(object_id)
+    found = {}
+    for content_type_id, object_ids in wanted.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        for object_id, item in model.objects.in_bulk(object_ids).items():
+            found[content_type_id, object_id] = item
+    return [found[key] for key in ranked if key in found]
@@ -0,0 +1,102 @@
+"""
+Daily sales rollups.
+
+``rollup_sales`` recomputes whole days from the orders, order lines and
+drawing tables with one GROUP BY query per metric and replaces those days'
+DailySales/DailyItemSales rows. It starts from the last rolled-up day minus
+SALES_ROLLUP_LOOKBACK_DAYS (orders can still be paid after the day they
+were placed), so each run only scans recent rows, and re-running it yields
+the same rows.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyItemSales, DailySales, DrawingStatusChange, Order, OrderLine, ToyDrawing
+
+PAID_STATUS = 'paid'
+
+
+def rollup_start(since=None):
+    """The first day the next run has to recompute, or ``None`` if there is nothing to roll up."""
+    if since:
+        return since
+    last = DailySales.objects.order_by('-date').values_list('date', flat=True).first()
+    if last:
+        return last - timedelta(days=settings.SALES_ROLLUP_LOOKBACK_DAYS)
+
+    firsts = [
+        model.objects.aggregate(first=Min('created_at'))['first']
+        for model in (Order, ToyDrawing)
+    ]
+    firsts = [timezone.localdate(first) for first in firsts if first]
+    return min(firsts) if firsts else None
+
+
+def daily_counts(queryset, field, **aggregates):
+    """``{date: {name: value}}`` for ``queryset`` grouped by the day of ``field``."""
+    rows = queryset.annotate(day=TruncDate(field)).order_by().values('day').annotate(**aggregates)
+    return {row.pop('day'): row for row in rows}
+
+
+def rollup_sales(since=None, until=None):
+    """Recompute the rollups from ``since`` (default: the high-water mark) to ``until`` (default: today)."""
+    start = rollup_start(since)
+    if start is None:
+        return 0
+    end = until or timezone.localdate()
+
+    # Datetime bounds rather than __date lookups, so the created_at filters can use an index
+    lower = timezone.make_aware(datetime.combine(start, time.min))
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+
+    orders = daily_counts(
+        Order.objects.filter(created_at__gte=lower, created_at__lt=upper), 'created_at',
+        orders=Count('id'),
+        paid_orders=Count('id', filter=Q(payment_status=PAID_STATUS)),
+        revenue=Sum('total_price', filter=Q(payment_status=PAID_STATUS)),
+    )
+    submitted = daily_counts(
+        ToyDrawing.objects.filter(created_at__gte=lower, created_at__lt=upper), 'created_at',
+        count=Count('id'),
+    )
+    # Approvals out of the review queue, from the status log
+    approved = daily_counts(
+        DrawingStatusChange.objects.filter(created_at__gte=lower, created_at__lt=upper,
+                                           old_status='pending', is_approved=True), 'created_at',
+        count=Count('drawing', distinct=True),
+    )
+    items = {}
+    lines = (OrderLine.objects.filter(order__created_at__gte=lower, order__created_at__lt=upper,
+                                      order__payment_status=PAID_STATUS)
+             .annotate(day=TruncDate('order__created_at')).order_by().values('day', 'item_type')
+             .annotate(units=Sum('quantity'), revenue=Sum(F('unit_price') * F('quantity'))))
+    for row in lines:
+        items.setdefault(row['day'], {})[row['item_type']] = row
+
+    days = []
+    day = start
+    while day <= end:
+        days.append(DailySales(
+            date=day,
+            orders=orders.get(day, {}).get('orders', 0),
+            paid_orders=orders.get(day, {}).get('paid_orders', 0),
+            revenue=orders.get(day, {}).get('revenue') or Decimal('0.00'),
+            drawings_submitted=submitted.get(day, {}).get('count', 0),
+            drawings_approved=approved.get(day, {}).get('count', 0),
+        ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        DailySales.objects.filter(date__gte=start, date__lte=end).delete()
+        created = {sales.date: sales for sales in DailySales.objects.bulk_create(days)}
+        DailyItemSales.objects.bulk_create([
+            DailyItemSales(day=created[day], item_type=item_type, units=row['units'], revenue=row['revenue'] or 0)
+            for day, types in items.items() for item_type, row in types.items()
+        ])
+    return len(days)
@@ -0,0 +1,46 @@
+"""
+Named counters that only go up, kept in the database.
+
+The cache changelogs (toys/catalog_cache.py, toys/facets.py) number their
+changes with these instead of ``cache.incr``. On the file-based cache
+``incr`` is a get followed by a set, so concurrent writers can be handed
+the same number, and the key expires with the default timeout, after which
+the count restarts at numbers processes have already seen.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import Sequence
+
+
+def next_value(name):
+    """Advance the ``name`` sequence and return its new value, in a single statement."""
+    if connection.vendor not in ('postgresql', 'sqlite') or not connection.features.can_return_columns_from_insert:
+        return increment_sequence(name)
+
+    table = connection.ops.quote_name(Sequence._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} (name, value) VALUES (%s, 1) '
+        f'ON CONFLICT (name) DO UPDATE SET value = {table}.value + 1 RETURNING value'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [name])
+        return cursor.fetchone()[0]
+
+
+def increment_sequence(name):
+    """Portable fallback for next_value."""
+    sequence = Sequence.objects.filter(name=name)
+    with transaction.atomic():
+        if not sequence.update(value=F('value') + 1):
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(name=name, value=1)
+                return 1
+            except IntegrityError:
+                sequence.update(value=F('value') + 1)
+        return sequence.values_list('value', flat=True).get()
+
+
+def current_value(name):
+    return Sequence.objects.filter(name=name).values_list('value', flat=True).first() or 0
@@ -1,16 +1,169 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import ToyDrawing
+from .auth import forget_user
+from .cart import merge_guest_cart, read_guest_cart
+from .catalog_cache import invalidate
+from .facets import publish
+from .mediafiles import adjust_references, reference_deltas
+from .models import Accessory, HomepageReview, Order, Review, Toy, ToyDrawing
+from .stats import bump_counters, drawing_deltas
 
 
 @receiver(post_save, sender=ToyDrawing)
 def send_approval_email(sender, instance, created, **kwargs):
-    if not created and instance.is_aproved:
+    if not created and instance.is_approved:
         send_mail(
             subject='Your uploaded drawing has been approved',
             message=f'Dear {instance.user.username}, \nYour "{instance.name}" has been approved, Thank you for your time',
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[instance.user.email]
         )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Covers password changes, is_active changes and deletion. Dropped again on
+    # commit in case another request re-cached the old row in the meantime.
+    forget_user(instance.pk)
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(user_logged_in)
+def merge_guest_cart_on_login(sender, request, user, **kwargs):
+    if request is None or settings.GUEST_CART_COOKIE_NAME not in request.COOKIES:
+        return
+    lines = read_guest_cart(request)
+    if lines:
+        merge_guest_cart(user, lines)
+    request.guest_cart_merged = True
+
+
+@receiver(pre_save, sender=ToyDrawing)
+@receiver(pre_save, sender=Order)
+def remember_counted_state(sender, instance, **kwargs):
+    # The state the dashboard counters currently include for this row
+    fields = ['status', 'is_approved', 'created_at'] if sender is ToyDrawing else ['payment_status']
+    instance._counted_state = sender.objects.filter(pk=instance.pk).values(*fields).first() if instance.pk else None
+
+
+@receiver(post_save, sender=ToyDrawing)
+def count_saved_drawing(sender, instance, **kwargs):
+    deltas = drawing_deltas(instance.status, instance.is_approved, instance.created_at)
+    old = getattr(instance, '_counted_state', None)
+    if old:
+        deltas.subtract(drawing_deltas(old['status'], old['is_approved'], old['created_at']))
+    bump_counters(deltas)
+
+
+@receiver(post_delete, sender=ToyDrawing)
+def count_deleted_drawing(sender, instance, **kwargs):
+    bump_counters(drawing_deltas(instance.status, instance.is_approved, instance.created_at, sign=-1))
+
+
+@receiver(post_save, sender=Order)
+def count_saved_order(sender, instance, **kwargs):
+    old = getattr(instance, '_counted_state', None)
+    old_status = old['payment_status'] if old else None
+    if old_status != instance.payment_status:
+        deltas = {('orders', instance.payment_status): 1}
+        if old_status is not None:
+            deltas['orders', old_status] = -1
+        bump_counters(deltas)
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order(sender, instance, **kwargs):
+    bump_counters({('orders', instance.payment_status): -1})
+
+
+@receiver(post_save, sender=HomepageReview)
+@receiver(post_delete, sender=HomepageReview)
+def forget_homepage_reviews(sender, instance, **kwargs):
+    # The cached review block on the homepage (see home.html)
+    key = make_template_fragment_key('homepage_reviews')
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(pre_save, sender=Accessory)
+def remember_accessory_toy(sender, instance, **kwargs):
+    instance._indexed_toy_id = sender.objects.filter(pk=instance.pk).values_list('toy_id', flat=True).first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Toy)
+@receiver(post_delete, sender=Toy)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Accessory)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def publish_facet_change(sender, instance, **kwargs):
+    # Re-index the affected toys in every process's facet index once the change is visible
+    toy_ids = {instance.pk} if sender is Toy else {instance.toy_id, getattr(instance, '_indexed_toy_id', None)}
+    for toy_id in toy_ids - {None}:
+        transaction.on_commit(lambda toy_id=toy_id: publish(toy_id))
+
+
+@receiver(post_save, sender=Toy)
+@receiver(post_delete, sender=Toy)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Accessory)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_cached_catalog(sender, instance, **kwargs):
+    # Only once committed: a worker that re-cached the old rows before then is
+    # behind the new version, and catalog writers don't queue on the sequence row
+    if sender is Toy:
+        names = {f'toy:{instance.pk}'}
+    elif sender is Accessory:
+        names = {f'accessories:{toy_id}' for toy_id in {instance.toy_id, getattr(instance, '_indexed_toy_id', None)} - {None}}
+    else:
+        names = {f'reviews:{instance.toy_id}'}
+    for name in names:
+        transaction.on_commit(lambda name=name: invalidate(name))
+
+
+@receiver(pre_save, sender=ToyDrawing)
+@receiver(pre_save, sender=Toy)
+@receiver(pre_save, sender=Accessory)
+@receiver(pre_save, sender=Review)
+@receiver(pre_save, sender=HomepageReview)
+def remember_stored_files(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._stored_files = {}
+        return
+    fields = [field.attname for field in sender._meta.concrete_fields if isinstance(field, FileField)]
+    instance._stored_files = sender._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(post_save, sender=ToyDrawing)
+@receiver(post_save, sender=Toy)
+@receiver(post_save, sender=Accessory)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=HomepageReview)
+def count_saved_files(sender, instance, **kwargs):
+    adjust_references(reference_deltas(instance, getattr(instance, '_stored_files', None)))
+
+
+@receiver(post_delete, sender=ToyDrawing)
+@receiver(post_delete, sender=Toy)
+@receiver(post_delete, sender=Accessory)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=HomepageReview)
+def count_deleted_files(sender, instance, **kwargs):
+    adjust_references(reference_deltas(instance, sign=-1))
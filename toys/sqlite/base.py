@@ -0,0 +1,39 @@
+"""
+SQLite backend tuned for one node serving concurrent requests.
+
+Use it as ENGINE 'toys.sqlite'. On top of Django's sqlite3 backend it reads
+two extra OPTIONS, as Django 5.1 does with ``init_command`` and
+``transaction_mode``:
+
+- ``pragmas``: ``{name: value}`` set on every new connection, e.g. WAL
+  journal mode so readers never wait for the writer.
+- ``transaction_mode``: ``'IMMEDIATE'`` opens atomic blocks with ``BEGIN
+  IMMEDIATE``. A deferred transaction that reads and then writes cannot
+  wait for a concurrent writer (both would deadlock), so SQLite fails it at
+  once with "database is locked"; an immediate one takes the write lock up
+  front and waits up to busy_timeout for it.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        mode = kwargs.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not {mode!r}.")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode.upper()}' if mode else 'BEGIN')
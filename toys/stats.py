@@ -0,0 +1,159 @@
+"""
+Incrementally maintained counters for the admin operations dashboard.
+
+Every write that changes a drawing's status/approval or an order's payment
+status adjusts a handful of StatCounter rows in the same transaction, so the
+dashboard reads a few small rows instead of counting the drawing and order
+tables. ``reconcile_stats`` rebuilds the counters from the tables to correct
+any drift (raw SQL, ``QuerySet.update()`` outside change_status, ...).
+
+Counter groups:
+
+``drawings``  ``"<status>:<is_approved 0/1>"`` -> number of drawings
+``queue``     ``"<UTC hour of created_at>"``   -> pending drawings created in that hour
+``orders``    ``"<payment_status>"``           -> number of orders
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import STATUS_CHOICES, Order, StatCounter, ToyDrawing
+
+QUEUE_STATUS = 'pending'
+QUEUE_HOUR_FORMAT = '%Y-%m-%dT%H'
+QUEUE_PERCENTILES = (50, 90, 99)
+
+
+def drawing_deltas(status, is_approved, created_at, sign=1):
+    """Counter changes for one drawing entering (sign=1) or leaving (sign=-1) a state."""
+    deltas = Counter({('drawings', f'{status}:{int(is_approved)}'): sign})
+    if status == QUEUE_STATUS:
+        deltas['queue', queue_hour(created_at)] += sign
+    return deltas
+
+
+def queue_hour(created_at):
+    return created_at.astimezone(dt_timezone.utc).strftime(QUEUE_HOUR_FORMAT)
+
+
+def bump_counters(deltas):
+    """
+    Apply ``{(group, key): delta}`` to the counters with a single
+    ``INSERT ... ON CONFLICT DO UPDATE``, creating missing counters. Runs in
+    the caller's transaction, so counters commit or roll back with the write
+    they describe.
+    """
+    rows = [(group, key, delta) for (group, key), delta in deltas.items() if delta]
+    if not rows:
+        return
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for group, key, delta in rows:
+            bump_counter(group, key, delta)
+        return
+
+    table = connection.ops.quote_name(StatCounter._meta.db_table)
+    values = ', '.join(['(%s, %s, %s)'] * len(rows))
+    sql = (
+        f'INSERT INTO {table} ("group", "key", value) VALUES {values} '
+        f'ON CONFLICT ("group", "key") DO UPDATE SET value = {table}.value + excluded.value'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def bump_counter(group, key, delta):
+    """Portable fallback for bump_counters: an F() update, or an insert if the counter is new."""
+    counter = StatCounter.objects.filter(group=group, key=key)
+    if counter.update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            StatCounter.objects.create(group=group, key=key, value=delta)
+    except IntegrityError:
+        counter.update(value=F('value') + delta)
+
+
+def reconcile_stats():
+    """
+    Recount every counter from the drawing and order tables and replace the
+    stored ones. Returns ``{(group, key): (stored, actual)}`` for the counters
+    that had drifted. A write committed while the recount runs can be missed;
+    the next reconcile picks it up.
+    """
+    actual = Counter()
+    for row in ToyDrawing.objects.order_by().values('status', 'is_approved').annotate(count=Count('id')):
+        actual['drawings', f"{row['status']}:{int(row['is_approved'])}"] = row['count']
+    pending = (ToyDrawing.objects.filter(status=QUEUE_STATUS).order_by()
+               .annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+               .values('hour').annotate(count=Count('id')))
+    for row in pending:
+        actual['queue', queue_hour(row['hour'])] = row['count']
+    for row in Order.objects.order_by().values('payment_status').annotate(count=Count('id')):
+        actual['orders', row['payment_status']] = row['count']
+
+    with transaction.atomic():
+        stored = {(c.group, c.key): c.value for c in StatCounter.objects.select_for_update()}
+        StatCounter.objects.all().delete()
+        StatCounter.objects.bulk_create([
+            StatCounter(group=group, key=key, value=value) for (group, key), value in actual.items() if value
+        ])
+
+    return {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in stored.keys() | actual.keys() if stored.get(key, 0) != actual.get(key, 0)
+    }
+
+
+def queue_percentiles(buckets, now):
+    """
+    Age of the pending queue at QUEUE_PERCENTILES, from ``{hour: count}``
+    buckets. Returns ``[(percentile, hours)]``.
+    """
+    total = sum(buckets.values())
+    if not total:
+        return []
+    ages = []
+    seen = 0
+    hours = sorted(buckets, reverse=True)  # youngest first
+    percentiles = list(QUEUE_PERCENTILES)
+    for hour in hours:
+        seen += buckets[hour]
+        while percentiles and seen * 100 >= percentiles[0] * total:
+            ages.append((percentiles.pop(0), age_in_hours(hour, now)))
+        if not percentiles:
+            break
+    return ages
+
+
+def age_in_hours(hour, now):
+    return (now - hour) // timedelta(hours=1)
+
+
+def dashboard():
+    """The operations dashboard figures, read from the counters only."""
+    labels = dict(STATUS_CHOICES)
+    drawings, queue, orders = [], {}, []
+    for counter in StatCounter.objects.filter(value__gt=0).order_by('group', 'key'):
+        if counter.group == 'drawings':
+            status, approved = counter.key.split(':')
+            drawings.append((labels.get(status, status), approved == '1', counter.value))
+        elif counter.group == 'queue':
+            hour = datetime.strptime(counter.key, QUEUE_HOUR_FORMAT).replace(tzinfo=dt_timezone.utc)
+            queue[hour] = counter.value
+        elif counter.group == 'orders':
+            orders.append((counter.key, counter.value))
+
+    now = timezone.now()
+    return {
+        'drawings': drawings,
+        'drawing_total': sum(count for _, _, count in drawings),
+        'queue_size': sum(queue.values()),
+        'queue_oldest': age_in_hours(min(queue), now) if queue else None,
+        'queue_percentiles': queue_percentiles(queue, now),
+        'orders': orders,
+        'order_total': sum(count for _, count in orders),
+    }
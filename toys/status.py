@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import STATUS_CHOICES, DrawingStatusChange
+from .stats import bump_counters, drawing_deltas
+
+
+def change_status(queryset, status, is_approved=None, changed_by=None):
+    """
+    Set ``status`` (and optionally ``is_approved``) on every drawing in
+    ``queryset`` and log each actual transition.
+
+    This is one SELECT of the current state, one UPDATE, one bulk INSERT
+    into DrawingStatusChange and one upsert of the dashboard counters,
+    however many drawings are selected. Like ``queryset.update()`` it fires
+    no model signals.
+    """
+    with transaction.atomic():
+        current = list(queryset.select_for_update().values_list('id', 'user_id', 'status', 'is_approved', 'created_at'))
+        changes = {'status': status}
+        if is_approved is not None:
+            changes['is_approved'] = is_approved
+        queryset.model.objects.filter(id__in=[row[0] for row in current]).update(**changes)
+
+        DrawingStatusChange.objects.bulk_create([
+            DrawingStatusChange(
+                drawing_id=drawing_id,
+                user_id=user_id,
+                old_status=old_status,
+                new_status=status,
+                is_approved=old_approved if is_approved is None else is_approved,
+                changed_by=changed_by,
+            )
+            for drawing_id, user_id, old_status, old_approved, created_at in current
+            if old_status != status or (is_approved is not None and old_approved != is_approved)
+        ])
+
+        deltas = Counter()
+        for drawing_id, user_id, old_status, old_approved, created_at in current:
+            deltas.update(drawing_deltas(status, old_approved if is_approved is None else is_approved, created_at))
+            deltas.subtract(drawing_deltas(old_status, old_approved, created_at))
+        bump_counters(deltas)
+    return len(current)
+
+
+def status_changes(user, last_id):
+    """``user``'s drawing status changes logged after ``last_id``, oldest first."""
+    return (DrawingStatusChange.objects.filter(user=user, id__gt=last_id).order_by('id')
+            .values('id', 'drawing_id', 'new_status', 'is_approved', 'created_at'))
+
+
+def status_event(change):
+    data = json.dumps({
+        'drawing': change['drawing_id'],
+        'status': change['new_status'],
+        'status_display': dict(STATUS_CHOICES).get(change['new_status'], change['new_status']),
+        'is_approved': change['is_approved'],
+        'changed_at': change['created_at'].isoformat(),
+    })
+    return f"id: {change['id']}\ndata: {data}\n\n"
+
+
+def retry_event():
+    return f"retry: {int(settings.DRAWING_EVENTS_POLL_SECONDS * 1000)}\n\n"
+
+
+async def status_events(user, last_id):
+    """
+    Yield Server-Sent Events for ``user``'s drawing status changes logged after
+    ``last_id``. Each poll is an index range scan on (user, id), so idle
+    streams cost one cheap query per DRAWING_EVENTS_POLL_SECONDS.
+    """
+    deadline = time.monotonic() + settings.DRAWING_EVENTS_MAX_SECONDS
+    yield retry_event()
+
+    while time.monotonic() < deadline:
+        sent = False
+        async for change in status_changes(user, last_id):
+            last_id = change['id']
+            yield status_event(change)
+            sent = True
+        if not sent:
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(settings.DRAWING_EVENTS_POLL_SECONDS)
+
+
+async def poll_status_events(user, last_id):
+    """
+    The first poll of ``status_events`` as one response body, for servers
+    that cannot stream (WSGI): the browser reconnects after the retry
+    interval with the last event id, so it polls instead of listening.
+    """
+    events = [retry_event()]
+    async for change in status_changes(user, last_id):
+        events.append(status_event(change))
+    return ''.join(events)
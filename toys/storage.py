@@ -0,0 +1,61 @@
+"""
+Content-addressed media storage.
+
+Files are saved as ``<upload_to><sha256 of the content><ext>``: uploading
+bytes that are already stored in the same directory writes nothing and
+returns the existing name, so identical uploads are stored once and Django
+never renames on collision. The ``upload_to`` directory is kept, so public
+and protected media (MEDIA_PUBLIC_DIRS) stay apart even when their content
+is the same.
+
+Since a file may be shared by several rows, ``delete`` leaves it in place.
+MediaFile counts the rows referencing each file (toys/mediafiles.py) and
+``manage.py gc_media`` purges the files nothing references any more.
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_BUFFER_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    """Hex SHA-256 of a Django File, leaving it rewound."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_BUFFER_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, content):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, content_hash(content) + os.path.splitext(filename)[1].lower())
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # An existing file under a content-derived name already holds the same bytes
+        return name
+
+    def _save(self, name, content):
+        name = content_name(name, content)
+        if not self.exists(name):
+            # Written under a unique name and renamed into place, so a concurrent
+            # upload of the same bytes never sees a partial file
+            temp = super()._save(posixpath.join(posixpath.dirname(name), f'.{uuid.uuid4().hex}.tmp'), content)
+            os.replace(self.path(temp), self.path(name))
+        # Imported here: storages can be loaded before the app registry is ready
+        from .mediafiles import register
+        register(name, self.size(name))
+        return name
+
+    def delete(self, name):
+        # Shared files are only purged by gc_media once no row references them
+        pass
+
+    def purge(self, name):
+        super().delete(name)
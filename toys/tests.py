@@ -1,3 +1,604 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection
+from django.template.backends.django import Template
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import catalog_cache, facets
+from .cart import merge_guest_cart, run_cart_request
+from .catalog import CatalogError, clean_row
+from .facets import get_facet_index, publish, publish_all
+from .mediafiles import collect_garbage, rehash_media
+from .models import (Accessory, Cart, CartItem, DrawingStatusChange, HomepageReview, MediaFile, Order, OrderLine,
+                     Review, Toy, ToyDrawing, UserProfile)
+from .orders import backfill_order_lines
+from .ratelimit import check_cache, count, rate_limit_stats, take_token
+from .uploads import start_upload
+
+
+class CartMutationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='secret')
+        self.cart = Cart.objects.create(user=self.user)
+        self.toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/bear.jpg')
+        self.toy_type = ContentType.objects.get_for_model(Toy)
+        self.client.login(username='shopper', password='secret')
+
+    def test_add_to_cart_increments_existing_line(self):
+        self.client.get(f'/add_to_cart/toy/{self.toy.id}/')
+        self.client.get(f'/add_to_cart/toy/{self.toy.id}/')
+
+        self.assertEqual(list(CartItem.objects.values_list('quantity', flat=True)), [2])
+
+    def test_duplicate_lines_are_rejected(self):
+        CartItem.objects.create(cart=self.cart, content_type=self.toy_type, object_id=self.toy.id)
+        with self.assertRaises(IntegrityError):
+            CartItem.objects.create(cart=self.cart, content_type=self.toy_type, object_id=self.toy.id)
+
+    def test_merge_guest_cart_adds_to_existing_lines(self):
+        CartItem.objects.create(cart=self.cart, content_type=self.toy_type, object_id=self.toy.id, quantity=2)
+        merge_guest_cart(self.user, {('toy', self.toy.id): 3, ('toy', 999): 1})
+
+        self.assertEqual(list(CartItem.objects.values_list('quantity', flat=True)), [5])
+
+    def test_other_users_drawings_cannot_be_added(self):
+        owner = User.objects.create(username='artist')
+        drawing = ToyDrawing.objects.create(user=owner, name='Private', description='A drawing',
+                                            image='customer_drawings/private.png')
+        operations = {'operations': [{'op': 'add', 'type': 'drawing', 'id': drawing.id}]}
+
+        response = self.client.post('/api/cart/', json.dumps(operations), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Private', response.content.decode())
+        self.assertEqual(self.client.get(f'/add_to_cart/drawing/{drawing.id}/').status_code, 404)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_unrelated_integrity_error_is_not_taken_for_a_retry(self):
+        with mock.patch('toys.cart.apply_operations', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                run_cart_request(self.user, [('add', 'toy', self.toy.id, 1)], idempotency_key='key')
+
+    def test_update_cart(self):
+        line = CartItem.objects.create(cart=self.cart, content_type=self.toy_type, object_id=self.toy.id)
+
+        self.client.get(f'/update_cart/{line.id}/1/')
+        self.client.get(f'/update_cart/{line.id}/1/')
+        self.client.get(f'/update_cart/{line.id}/0/')
+        line.refresh_from_db()
+
+        self.assertEqual(line.quantity, 2)
+        self.assertEqual(self.client.get('/update_cart/999/1/').status_code, 404)
+
+
+class ParallelCartTests(TransactionTestCase):
+    threads = 8
+    clicks = 10
+
+    def test_parallel_add_to_cart_loses_no_increments(self):
+        user = User.objects.create_user('shopper', password='secret')
+        toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/bear.jpg')
+        errors = []
+
+        def click():
+            client = Client()
+            client.force_login(user)
+            try:
+                for _ in range(self.clicks):
+                    client.get(f'/add_to_cart/toy/{toy.id}/')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=click) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(list(CartItem.objects.values_list('quantity', flat=True)), [self.threads * self.clicks])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-cache'}},
+    CATALOG_SYNC_SECONDS=0,
+)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(catalog_cache, '_local', catalog_cache.LocalCache(10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+    def test_change_is_seen_after_shared_keys_expire(self):
+        toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/bear.jpg')
+        self.assertEqual(catalog_cache.get_toy(toy.id).price, 10)
+
+        # Every shared key expires, then another worker (with its own LRU) reprices the toy
+        cache.clear()
+        Toy.objects.filter(pk=toy.pk).update(price=20)
+        with mock.patch.object(catalog_cache, '_local', catalog_cache.LocalCache(10)):
+            catalog_cache.invalidate(f'toy:{toy.id}')
+
+        self.assertEqual(catalog_cache.get_toy(toy.id).price, 20)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'facets'}},
+)
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(facets, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/bear.jpg')
+        publish(self.toy.id)
+        self.assertNotIn(self.toy.id, get_facet_index().sets.get(('in_stock', '1'), set()))
+
+    def test_change_is_seen_after_cache_keys_expire(self):
+        cache.clear()
+        Toy.objects.filter(pk=self.toy.pk).update(stock=3)
+        publish(self.toy.id)
+
+        self.assertIn(self.toy.id, get_facet_index().sets[('in_stock', '1')])
+
+    def test_unpublished_change_is_seen_after_rebuild(self):
+        Toy.objects.filter(pk=self.toy.pk).update(stock=3)
+
+        with override_settings(FACET_INDEX_SECONDS=0):
+            self.assertIn(self.toy.id, get_facet_index().sets[('in_stock', '1')])
+
+
+class CatalogRowTests(SimpleTestCase):
+    def test_bad_prices_are_row_errors(self):
+        for price in ('NaN', 'sNaN', 'Infinity', '-1', '1e9', 'ten'):
+            with self.subTest(price=price), self.assertRaises(CatalogError):
+                clean_row({'type': 'toy', 'sku': 'bear', 'name': 'Bear', 'image': 'bear.jpg', 'price': price})
+
+
+class DrawingStatusEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='shopper')
+        drawing = ToyDrawing.objects.create(user=self.user, name='Own', description='A drawing',
+                                            image='customer_drawings/own.png')
+        self.change = DrawingStatusChange.objects.create(drawing=drawing, user=self.user, old_status='pending',
+                                                         new_status='in_progress', is_approved=True)
+
+    def test_wsgi_request_gets_one_poll(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get('/track_drawings/events/', {'after': 0})
+
+        self.assertFalse(response.streaming)
+        body = response.content.decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn(f'id: {self.change.id}\ndata: ', body)
+
+    async def test_asgi_request_gets_a_stream(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+
+        response = await self.async_client.get('/track_drawings/events/', {'after': 0})
+
+        self.assertTrue(response.streaming)
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def references(self, name):
+        return MediaFile.objects.get(name=name).reference_count
+
+    def age(self, name, hours=48):
+        MediaFile.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(hours=hours))
+
+    def toy(self, image):
+        return Toy.objects.create(name='Bear', description='A bear', price=10, image=image)
+
+    def test_identical_uploads_share_one_file(self):
+        first = default_storage.save('toys/bear.jpg', ContentFile(b'bear'))
+        second = default_storage.save('toys/teddy.jpg', ContentFile(b'bear'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(default_storage.path('toys')), [os.path.basename(first)])
+        self.assertEqual(self.references(first), 0)
+
+    def test_save_replace_and_delete_adjust_references(self):
+        toy = self.toy(ContentFile(b'bear', name='bear.jpg'))
+        other = self.toy(ContentFile(b'bear', name='teddy.jpg'))
+        bear = toy.image.name
+        self.assertEqual(self.references(bear), 2)
+
+        toy.image = ContentFile(b'panda', name='panda.jpg')
+        toy.save()
+        self.assertEqual(self.references(bear), 1)
+        self.assertEqual(self.references(toy.image.name), 1)
+
+        other.delete()
+        self.assertEqual(self.references(bear), 0)
+        self.assertTrue(default_storage.exists(bear))
+
+    def test_garbage_collection_keeps_files_written_without_signals(self):
+        bulk = default_storage.save('toys/bulk.jpg', ContentFile(b'bulk'))
+        updated = default_storage.save('toys/updated.jpg', ContentFile(b'updated'))
+        Toy.objects.bulk_create([Toy(name='Bulk', description='A toy', price=10, image=bulk)])
+        Toy.objects.filter(pk=self.toy(bulk).pk).update(image=updated)
+        self.age(bulk)
+        self.age(updated)
+
+        self.assertEqual(collect_garbage(grace_hours=24), (0, 0))
+        self.assertTrue(default_storage.exists(bulk))
+        self.assertTrue(default_storage.exists(updated))
+        self.assertEqual(self.references(updated), 1)
+
+    def test_garbage_collection_waits_for_the_grace_period(self):
+        orphan = default_storage.save('toys/orphan.jpg', ContentFile(b'orphan'))
+
+        self.assertEqual(collect_garbage(grace_hours=24), (0, 0))
+        self.assertTrue(default_storage.exists(orphan))
+
+        self.age(orphan)
+        self.assertEqual(collect_garbage(grace_hours=24), (1, len(b'orphan')))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(MediaFile.objects.filter(name=orphan).exists())
+
+    def test_rehash_moves_legacy_names_to_content_names(self):
+        os.makedirs(default_storage.path('toys'))
+        with open(default_storage.path('toys/legacy.jpg'), 'wb') as f:
+            f.write(b'legacy')
+        toy = self.toy('toys/legacy.jpg')
+
+        self.assertEqual(rehash_media(), 1)
+
+        toy.refresh_from_db()
+        self.assertEqual(toy.image.name, f"toys/{hashlib.sha256(b'legacy').hexdigest()}.jpg")
+        self.assertEqual(self.references(toy.image.name), 1)
+        self.assertEqual(self.references('toys/legacy.jpg'), 0)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class OrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='secret')
+        self.client.login(username='shopper', password='secret')
+        self.toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/bear.jpg')
+        self.drawing = ToyDrawing.objects.create(user=self.user, name='Own', description='A drawing',
+                                                 image='customer_drawings/own.png')
+        cart = Cart.objects.create(user=self.user)
+        for item, quantity in ((self.toy, 2), (self.drawing, 1)):
+            CartItem.objects.create(cart=cart, content_type=ContentType.objects.get_for_model(item), object_id=item.id,
+                                    quantity=quantity)
+        patcher = mock.patch('toys.views.get_stripe')
+        self.stripe = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.stripe.checkout.Session.create.return_value.url = 'https://checkout.stripe.test/session'
+
+    def cart(self):
+        return sorted(CartItem.objects.values_list('object_id', 'quantity'))
+
+    def test_stripe_failure_keeps_the_cart(self):
+        cart = self.cart()
+        self.stripe.checkout.Session.create.side_effect = RuntimeError("Stripe is down")
+
+        with self.assertRaises(RuntimeError):
+            self.client.post('/payment/')
+
+        self.assertEqual(self.cart(), cart)
+        self.assertFalse(Order.objects.exists())
+
+    def test_cancel_puts_the_order_back_into_the_cart(self):
+        cart = self.cart()
+        self.assertEqual(self.client.post('/payment/').status_code, 303)
+        order = Order.objects.get()
+        self.assertEqual(self.cart(), [])
+        self.assertEqual(sorted(order.lines.values_list('name', 'quantity')), [('Bear', 2), ('Own', 1)])
+
+        self.client.get('/payment/cancel/', {'order': order.id})
+
+        self.assertEqual(self.cart(), cart)
+        self.assertFalse(Order.objects.exists())
+
+    def test_backfill_gives_old_orders_one_line_per_drawing(self):
+        order = Order.objects.create(user=self.user, total_price=self.drawing.price)
+        order.items.add(self.drawing)
+
+        self.assertEqual(backfill_order_lines(), 1)
+        self.assertEqual(list(order.lines.values_list('item_type', 'item_id', 'name', 'quantity')),
+                         [('drawing', self.drawing.id, 'Own', 1)])
+        self.assertEqual(backfill_order_lines(), 0)
+
+    @override_settings(ORDERS_PER_PAGE=2)
+    def test_profile_pages_order_history(self):
+        orders = [Order.objects.create(user=self.user, total_price=i) for i in range(3)]
+
+        first = self.client.get('/profile/')
+        self.assertEqual(list(first.context['orders']), orders[:0:-1])
+        second = self.client.get('/profile/', {'orders_before': first.context['next_orders_cursor']})
+        self.assertEqual(list(second.context['orders']), orders[:1])
+        self.assertIsNone(second.context['next_orders_cursor'])
+
+
+class AuthBackendTests(TestCase):
+    def test_sessions_from_before_the_cached_backend_stay_logged_in(self):
+        user = User.objects.create_user('shopper', password='secret')
+        self.client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+
+        self.assertEqual(self.client.get('/profile/').status_code, 200)
+
+
+class PriceQuoteTests(TestCase):
+    def test_out_of_range_base_price_is_rejected(self):
+        response = self.client.get('/api/quote/', {'width': 10, 'height': 10, 'base_price': '1e30'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': "'base_price' must be at most 99999999.99."})
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        # The file-based cache resets a key's timeout to the 300 s default on incr and decr
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        cache_settings = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}},
+            RATE_LIMITS={'register': {'rate': '5/h', 'burst': 3}},
+        )
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        patcher = mock.patch('time.time', return_value=1_000_000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_limited_bucket_outlives_default_cache_timeout(self):
+        self.assertEqual([take_token('register', 'user:1') for _ in range(3)], [0, 0, 0])
+        self.assertTrue(take_token('register', 'user:1'))
+
+        self.clock.return_value += 301
+        self.assertTrue(take_token('register', 'user:1'))
+
+    def test_stats_outlive_default_cache_timeout(self):
+        count('register', 'allowed')
+        count('register', 'allowed')
+
+        self.clock.return_value += 301
+        self.assertEqual(rate_limit_stats(), [('register', 2, 0)])
+
+    def test_non_atomic_cache_is_reported(self):
+        with self.assertLogs('toys.ratelimit', 'WARNING'):
+            self.assertFalse(check_cache())
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertTrue(check_cache())
+
+
+class UploadRateLimitTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('shopper', password='secret'))
+        patcher = mock.patch('toys.ratelimit.take_token', return_value=0)
+        self.take_token = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_price_preview_is_not_charged(self):
+        self.client.post('/upload/', {'name': 'Robot', 'width': 10, 'height': 10})
+        self.take_token.assert_not_called()
+
+    def test_chunked_upload_is_charged_once(self):
+        response = self.client.post('/upload/chunked/', {'filename': 'robot.png', 'size': 100})
+        self.client.post('/upload/', {'name': 'Robot', 'width': 10, 'height': 10,
+                                      'upload_id': response.json()['upload_id'], 'submit_drawing': ''})
+        self.assertEqual(self.take_token.call_count, 1)
+
+    def test_submission_is_charged(self):
+        self.client.post('/upload/', {'name': 'Robot', 'width': 10, 'height': 10, 'submit_drawing': ''})
+        self.assertEqual(self.take_token.call_count, 1)
+
+
+SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_LIST_RE = re.compile(r'\(\?(?:, \?)*\)')
+SQL_OR_RE = re.compile(r'(\([^()]*\))(?: OR \1)+')
+
+
+def query_shape(sql):
+    """``sql`` with its literals replaced by ``?`` and value lists collapsed, so repeats of one query compare equal."""
+    return SQL_OR_RE.sub(r'\1 OR ...', SQL_LIST_RE.sub('(...)', SQL_LITERAL_RE.sub('?', sql)))
+
+
+def growth_message(view, small, large, small_rows, large_rows):
+    """Name the query shapes that ``view`` ran more often with ``large_rows`` than with ``small_rows``."""
+    lines = [f"{view} made {len(small)} queries with {small_rows} rows of each kind and {len(large)} with "
+             f"{large_rows}."]
+    grown = Counter(map(query_shape, large)) - Counter(map(query_shape, small))
+    lines += [f"  {count} more: {shape}" for shape, count in grown.most_common()]
+    return '\n'.join(lines)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-budget'}},
+    RATE_LIMIT_ENABLED=False,
+    CATALOG_SYNC_SECONDS=0,
+)
+class QueryBudgetTests(TestCase):
+    """
+    Every view in toys/urls.py has to make no more queries with LARGE rows of
+    everything it can list than with SMALL rows; a view that does fails
+    with the query shapes that repeat. Each request starts with empty caches
+    so both sizes are measured alike. Template render times are recorded
+    too, and written as JSON Lines to $QUERY_BUDGET_REPORT if it is set.
+    """
+    small = 2
+    large = 12
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        for name in ('toys/bear.jpg', 'customer_drawings/own.png'):
+            os.makedirs(os.path.join(cls.media_root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(cls.media_root, name), 'wb') as f:
+                f.write(b'image')
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root,
+                                               CHUNKED_UPLOAD_DIR=os.path.join(cls.media_root, 'uploads'))
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root)
+
+    def setUp(self):
+        # No per-process tier: every request reads the (cleared) shared cache
+        patcher = mock.patch.object(catalog_cache, '_local', catalog_cache.LocalCache(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(username='shopper')
+        UserProfile.objects.create(user=self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.toy = Toy.objects.create(name='Bear', description='A bear', price=10, image='toys/bear.jpg')
+        self.drawing = ToyDrawing.objects.create(user=self.user, name='Own', description='A drawing',
+                                                 image='customer_drawings/own.png')
+        self.upload = start_upload(self.user, 'drawing.png', 100)
+        self.seeded = 0
+
+    def seed(self, rows):
+        """Grow every table a view can list to ``rows`` entries."""
+        for i in range(self.seeded, rows):
+            reviewer = User.objects.create(username=f'reviewer{i}')
+            toy = Toy.objects.create(name=f'Toy {i}', description='A toy', price=5 + i, stock=i % 3,
+                                     image='toys/bear.jpg')
+            accessory = Accessory.objects.create(toy=self.toy, name=f'Accessory {i}', description='An accessory',
+                                                 price=2, image='accessories/hat.jpg')
+            drawing = ToyDrawing.objects.create(user=self.user, name=f'Drawing {i}', description='A drawing',
+                                                image=f'customer_drawings/{i}.png')
+            Review.objects.create(toy=self.toy, user=reviewer, rating=i % 5 + 1, comment='Lovely')
+            Review.objects.create(toy=toy, user=reviewer, rating=4)
+            HomepageReview.objects.create(customer_name=f'Customer {i}', email='customer@example.com',
+                                          review_TEXT='Great shop')
+            for item in (toy, accessory, drawing):
+                CartItem.objects.create(cart=self.cart, content_type=ContentType.objects.get_for_model(item),
+                                        object_id=item.id)
+            order = Order.objects.create(user=self.user, total_price=7)
+            OrderLine.objects.bulk_create([
+                OrderLine(order=order, item_type='toy', item_id=toy.id, name=toy.name, unit_price=5),
+                OrderLine(order=order, item_type='accessory', item_id=accessory.id, name=accessory.name,
+                          unit_price=2),
+            ])
+            order.items.add(drawing)
+        self.seeded = rows
+
+    def views(self):
+        """``(view, method, path, client kwargs)`` for every URL in toys/urls.py."""
+        line = CartItem.objects.filter(cart=self.cart).order_by('id').first()
+        operations = json.dumps({'operations': [{'op': 'add', 'type': 'toy', 'id': self.toy.id}]})
+        return [
+            ('home', 'get', '/', {}),
+            ('register', 'get', '/register/', {}),
+            ('upload_drawing', 'get', '/upload/', {}),
+            ('start_chunked_upload', 'post', '/upload/chunked/', {'data': {'filename': 'drawing.png', 'size': 100}}),
+            ('chunked_upload', 'get', f'/upload/chunked/{self.upload.id}/', {}),
+            ('view_cart', 'get', '/cart/', {}),
+            ('cart_api', 'post', '/api/cart/', {'data': operations, 'content_type': 'application/json'}),
+            ('add_to_cart', 'get', f'/add_to_cart/toy/{self.toy.id}/', {}),
+            ('toy_list', 'get', '/toys/', {}),
+            ('toy_details', 'get', f'/toys/{self.toy.id}/', {}),
+            ('add_toy', 'get', '/add_toy/', {}),
+            ('add_accessory', 'get', '/add_accessory/', {}),
+            ('update_cart', 'get', f'/update_cart/{line.id}/1/', {}),
+            ('price_quote', 'get', '/api/quote/', {'data': {'width': 10, 'height': 12}}),
+            ('track_drawings', 'get', '/track_drawings/', {}),
+            ('drawing_status_events', 'get', '/track_drawings/events/', {'data': {'after': 0}}),
+            ('edit_drawing', 'get', f'/edit_drawing/{self.drawing.id}/', {}),
+            ('user_profile', 'get', '/profile/', {}),
+            ('edit_profile', 'get', '/profile/edit/', {}),
+            ('checkout', 'get', '/checkout/', {}),
+            ('payment', 'get', '/payment/', {}),
+            ('payment_success', 'get', '/payment/success/', {}),
+            ('payment_cancel', 'get', '/payment/cancel/', {}),
+            ('readiness', 'get', '/ready/', {}),
+            ('protected_media', 'get', '/media/customer_drawings/own.png', {}),
+            ('public_media', 'get', '/media/toys/bear.jpg', {}),
+            ('remove_from_cart', 'get', f'/remove_from_cart/{line.id}/', {}),
+            ('logout', 'post', '/accounts/logout/', {}),
+        ]
+
+    def measure(self, method, path, kwargs):
+        """Run one request from cold caches; returns its SQL and the seconds spent rendering templates."""
+        self.client.force_login(self.user)
+        cache.clear()
+        publish_all()
+
+        rendering = []
+        render = Template.render
+
+        def timed_render(template, context=None, request=None):
+            start = time.perf_counter()
+            try:
+                return render(template, context, request)
+            finally:
+                rendering.append(time.perf_counter() - start)
+
+        stripe = mock.Mock()
+        stripe.checkout.Session.create.return_value.url = 'https://checkout.stripe.test/session'
+        with mock.patch.object(Template, 'render', timed_render), mock.patch('toys.views.get_stripe', return_value=stripe):
+            with CaptureQueriesContext(connection) as queries:
+                getattr(self.client, method)(path, **kwargs)
+        return [query['sql'] for query in queries.captured_queries], sum(rendering)
+
+    def test_query_counts_do_not_grow_with_data(self):
+        measured = {}
+        for rows in (self.small, self.large):
+            self.seed(rows)
+            for view, method, path, kwargs in self.views():
+                measured.setdefault(view, []).append(self.measure(method, path, kwargs))
+
+        report = os.environ.get('QUERY_BUDGET_REPORT')
+        if report:
+            with open(report, 'w') as f:
+                for view, ((small, small_render), (large, large_render)) in measured.items():
+                    f.write(json.dumps({
+                        'view': view, 'queries': len(small), 'queries_large': len(large),
+                        'render_ms': round(small_render * 1000, 2), 'render_ms_large': round(large_render * 1000, 2),
+                    }) + '\n')
+
+        for view, ((small, small_render), (large, large_render)) in measured.items():
+            with self.subTest(view=view):
+                self.assertLessEqual(len(large), len(small), growth_message(view, small, large, self.small, self.large)
+                                 + f"\nTemplates rendered in {small_render * 1000:.1f} ms and {large_render * 1000:.1f} ms.")
+
+    def test_growth_message_names_repeated_queries(self):
+        small = ['SELECT "toys_toy"."name" FROM "toys_toy" WHERE "toys_toy"."id" = 1']
+        large = small + ['SELECT "toys_toy"."name" FROM "toys_toy" WHERE "toys_toy"."id" = 2',
+                         'SELECT "toys_toy"."name" FROM "toys_toy" WHERE "toys_toy"."id" = 3']
+
+        message = growth_message('view_cart', small, large, 2, 12)
+
+        self.assertIn('view_cart made 1 queries with 2 rows of each kind and 3 with 12.', message)
+        self.assertIn('2 more: SELECT "toys_toy"."name" FROM "toys_toy" WHERE "toys_toy"."id" = ?', message)
+
+    def test_query_shape_collapses_repeated_conditions(self):
+        self.assertEqual(query_shape('SELECT 1 FROM "t" WHERE "t"."id" IN (1, 2, 3) AND ("a" = 1) OR ("a" = 2)'),
+                         'SELECT ? FROM "t" WHERE "t"."id" IN (...) AND ("a" = ?) OR ...')
@@ -0,0 +1,130 @@
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from .imagehash import dhash
+from .models import ChunkedUpload
+
+# Bytes copied from the request to disk at a time. This is the only buffer a
+# chunk goes through, so per-upload memory stays flat whatever the file size.
+COPY_BUFFER_SIZE = 64 * 1024
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    pass
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.id}.part')
+
+
+def received_bytes(upload):
+    try:
+        return os.path.getsize(part_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def start_upload(user, filename, size):
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f"File size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.")
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    upload = ChunkedUpload.objects.create(user=user, filename=os.path.basename(filename)[:255], size=size)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError("A 'Content-Range: bytes start-end/total' header is required.")
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        raise UploadError("Invalid Content-Range.")
+    return start, end - start + 1, total
+
+
+def write_chunk(upload, start, length, stream):
+    """
+    Copy ``length`` bytes from ``stream`` into the upload's part file at
+    ``start`` and return the new offset. Chunks are written at their offset,
+    so a client retrying a chunk whose response was lost overwrites it rather
+    than duplicating it.
+    """
+    offset = received_bytes(upload)
+    if start > offset:
+        raise UploadError(f"Expected a chunk starting at byte {offset}.")
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE or start + length > upload.size:
+        raise UploadError("Chunk is too large.")
+
+    with open(part_path(upload), 'r+b') as part:
+        part.seek(start)
+        remaining = length
+        while remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                # Client went away mid-chunk: drop the partial chunk so the
+                # next attempt resumes from a chunk boundary.
+                part.truncate(offset)
+                raise UploadError("Chunk ended early.")
+            part.write(data)
+            remaining -= len(data)
+    return received_bytes(upload)
+
+
+def validate_image(path):
+    """
+    Check format and dimensions from the image header only. ``Image.open`` is
+    lazy and does not decode pixel data, so this costs the same for a 50 MB
+    scan as for a thumbnail.
+    """
+    from PIL import Image  # imported on first use to keep worker startup fast
+
+    try:
+        with Image.open(path) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise UploadError("Upload a valid image.")
+    if image_format not in ALLOWED_FORMATS:
+        raise UploadError(f"Unsupported image format: {image_format}.")
+    if width * height > settings.CHUNKED_UPLOAD_MAX_PIXELS:
+        raise UploadError(f"Image is too large ({width}x{height}).")
+    return image_format, width, height
+
+
+def attach_upload(upload, drawing):
+    """
+    Move a finished upload into ``drawing.image`` and save the drawing.
+
+    The file is written to storage first and the row saved in a transaction,
+    so a drawing never points at a half-written image; if saving fails the
+    stored file is left unreferenced for gc_media.
+    """
+    path = part_path(upload)
+    if received_bytes(upload) != upload.size:
+        raise UploadError("Upload is not complete yet.")
+    validate_image(path)
+    drawing.image_hash = dhash(path)
+
+    with open(path, 'rb') as part:
+        drawing.image.save(upload.filename, File(part), save=False)
+    with transaction.atomic():
+        drawing.save()
+        upload.delete()
+    os.remove(path)
+    return drawing
+
+
+def discard_upload(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
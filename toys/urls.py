@@ -2,13 +2,15 @@ from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('register/', views.register, name='register'),
     path('upload/', views.upload_drawing, name='upload_drawing'),
+    path('upload/chunked/', views.start_chunked_upload, name='start_chunked_upload'),
+    path('upload/chunked/<uuid:upload_id>/', views.chunked_upload, name='chunked_upload'),
     path('cart/', views.view_cart, name='view_cart'),
+    path('api/cart/', views.cart_api, name='cart_api'),
     path('add_to_cart/<str:item_type>/<int:item_id>/', views.add_to_cart, name='add_to_cart'),
     path('toys/', views.toy_list, name='toy_list'),
     path('toys/<int:id>/', views.toy_details, name='toy_details'),
@@ -16,7 +18,9 @@ urlpatterns = [
     path('add_accessory/', views.add_accessory, name='add_accessory'),
     path('update_cart/<int:item_id>/<int:action>/', views.update_cart, name='update_cart'),
     path('remove_from_cart/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('api/quote/', views.price_quote, name='price_quote'),
     path('track_drawings/', views.track_drawings, name='track_drawings'),
+    path('track_drawings/events/', views.drawing_status_events, name='drawing_status_events'),
     path('edit_drawing/<int:id>/', views.edit_drawing, name='edit_drawing'),
     path('profile/', views.user_profile, name='user_profile'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
@@ -25,7 +29,7 @@ urlpatterns = [
     path('payment/', views.payment, name='payment'),
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/cancel/', views.payment_cancel, name='payment_cancel'),
-]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('ready/', views.readiness, name='readiness'),
+    path(settings.MEDIA_URL.lstrip('/') + 'customer_drawings/<path:path>', views.protected_media, name='protected_media'),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', views.public_media, name='public_media'),
+]
\ No newline at end of file
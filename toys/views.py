@@ -1,25 +1,52 @@
-import stripe
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.db.models.functions import Substr
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from .models import ToyDrawing, Cart, CartItem, Toy, Accessory, UserProfile, Order, Review, HomepageReview
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_http_methods
+from .cart import (CART_ITEM_TYPES, GUEST_ITEM_CODES, CartError, GuestCartFull, add_cart_items, add_to_guest_cart,
+                   guest_cart_items, parse_operations, read_guest_cart, run_cart_request, write_guest_cart)
+from .catalog_cache import get_accessories, get_review_summary, get_toy
+from .facets import get_facet_index, selected_facets
+from .media import send_media
+from .orders import place_order, restore_cart
+from .pagination import keyset_page
+from .payments import get_stripe
+from .pricing import drawing_price, quote_request
+from .ratelimit import rate_limit
+from .recommendations import recommendations
+from .status import poll_status_events, status_events
+from .models import (STATUS_CHOICES, ToyDrawing, Cart, CartItem, Toy, UserProfile, Order, Review, HomepageReview, ChunkedUpload,
+                     DrawingStatusChange)
+from . import warmup
+from .uploads import (UploadError, attach_upload, discard_upload, parse_content_range, part_path, received_bytes,
+                      start_upload, validate_image, write_chunk)
 from .forms import ToyDrawingForm, UserRegisterForm, ToyForm, AccessoryForm, ReviewForm, UserProfileForm
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 """
 View: home
-Description: Displays the homepage with customer reviews. Retrieves all `HomepageReview` objects and orders them by their creation date.
+Description: Displays the homepage with the newest customer reviews. The review block is cached, and the queryset is
+only evaluated when the cache is cold.
 """
 
 
 def home(request):
-    reviews = HomepageReview.objects.all().order_by('-created_at')
-    return render(request, 'toys/home.html', {'reviews': reviews})
+    reviews = HomepageReview.objects.order_by('-created_at')[:settings.HOMEPAGE_REVIEW_COUNT]
+    return render(request, 'toys/home.html', {
+        'reviews': reviews,
+        'reviews_cache_seconds': settings.HOMEPAGE_REVIEWS_CACHE_SECONDS,
+    })
 
 
 """
@@ -29,6 +56,7 @@ The user is logged in and redirected to the homepage upon successful registratio
 """
 
 
+@rate_limit('register')
 def register(request):
     if request.method == 'POST':
         form = UserRegisterForm(request.POST)
@@ -44,6 +72,11 @@ def register(request):
     return render(request, 'toys/register.html', {'form': form})
 
 
+def submits_new_upload(request):
+    """Whether a drawing form POST submits a drawing whose image wasn't already charged by start_chunked_upload."""
+    return 'submit_drawing' in request.POST and not request.POST.get('upload_id')
+
+
 """
 View: upload_drawing
 Description: Handles the upload of toy drawings by authenticated users. It calculates the price based on the dimensions, 
@@ -52,6 +85,7 @@ saves the drawing and uploaded image, and sends an email notification to the adm
 
 
 @login_required
+@rate_limit('upload_drawing', when=submits_new_upload)
 def upload_drawing(request):
     calculated_price = None
 
@@ -63,9 +97,7 @@ def upload_drawing(request):
 
             width = form.cleaned_data.get('width')
             height = form.cleaned_data.get('height')
-            base_area = 100
-            drawing_area = width * height
-            calculated_price = (drawing_area / base_area) * drawing.base_price
+            calculated_price = drawing_price(width, height, drawing.base_price)
 
             if 'submit_drawing' in request.POST:
                 drawing.user = request.user
@@ -73,7 +105,8 @@ def upload_drawing(request):
 
                 if 'image' in request.FILES:
                     drawing.image = request.FILES['image']
-                drawing.save()
+                if not save_drawing(request, form, drawing):
+                    return render(request, 'toys/upload_drawing.html', {'form': form, 'calculated_price': calculated_price})
 
                 send_mail(
                     subject='New Drawing Uploaded',
@@ -93,6 +126,113 @@ def upload_drawing(request):
     return render(request, 'toys/upload_drawing.html', {'form': form, 'calculated_price': calculated_price})
 
 
+def save_drawing(request, form, drawing):
+    """Save a validated drawing, attaching its chunked upload if the image was sent that way."""
+    upload_id = form.cleaned_data.get('upload_id')
+    if not upload_id:
+        drawing.save()
+        return True
+
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+    try:
+        attach_upload(upload, drawing)
+    except UploadError as e:
+        form.add_error(None, str(e))
+        return False
+    return True
+
+
+"""
+View: start_chunked_upload
+Description: Starts a resumable drawing image upload. Returns an upload ID that the client sends chunks to, 
+so large scans are never held in memory and a dropped connection only costs the current chunk. The upload is charged 
+to the 'upload_drawing' rate limit here, so submitting the drawing with its upload ID isn't charged again.
+"""
+
+
+@login_required
+@require_POST
+@rate_limit('upload_drawing')
+def start_chunked_upload(request):
+    try:
+        size = int(request.POST.get('size', ''))
+        upload = start_upload(request.user, request.POST.get('filename') or 'drawing', size)
+    except ValueError:
+        return JsonResponse({'error': "A numeric 'size' is required."}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(upload_status(upload), status=201)
+
+
+"""
+View: chunked_upload
+Description: GET reports how many bytes of an upload have been received so the client can resume from there. 
+PUT writes one chunk, described by a Content-Range header. Once the last chunk arrives the image header is validated; 
+the finished upload is attached to a drawing by submitting its ID with the upload or edit drawing form.
+"""
+
+
+@login_required
+@require_http_methods(['GET', 'PUT'])
+def chunked_upload(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+
+    if request.method == 'PUT':
+        try:
+            start, length, total = parse_content_range(request.headers.get('Content-Range'))
+            if total != upload.size or int(request.META.get('CONTENT_LENGTH') or 0) != length:
+                raise UploadError("Content-Range does not match the upload.")
+            write_chunk(upload, start, length, request)
+        except UploadError as e:
+            return JsonResponse({'error': str(e), **upload_status(upload)}, status=409)
+
+        if received_bytes(upload) == upload.size:
+            try:
+                validate_image(part_path(upload))
+            except UploadError as e:
+                discard_upload(upload)
+                return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(upload_status(upload))
+
+
+def upload_status(upload):
+    offset = received_bytes(upload)
+    return {
+        'upload_id': str(upload.id),
+        'offset': offset,
+        'size': upload.size,
+        'chunk_size': settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+        'complete': offset == upload.size,
+    }
+
+
+"""
+View: price_quote
+Description: Prices one or many drawing sizes without touching the database. GET takes `width`, `height` and an optional 
+`base_price`; POST takes a JSON body `{"items": [{"width": ..., "height": ..., "base_price": ...}, ...]}`. 
+Used for the live price preview on the upload and edit drawing forms.
+"""
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def price_quote(request):
+    try:
+        if request.method == 'POST':
+            items = json.loads(request.body).get('items')
+            if not isinstance(items, list) or not 0 < len(items) <= settings.PRICE_QUOTE_MAX_ITEMS:
+                raise ValueError(f"'items' must be a list of 1 to {settings.PRICE_QUOTE_MAX_ITEMS} sizes.")
+        else:
+            items = [request.GET]
+        quotes = [quote_request(item) for item in items]
+    except (ValueError, AttributeError, ArithmeticError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({'quotes': quotes})
+
+
 """
 View: track_drawings
 Description: Displays all toy drawings uploaded by the currently authenticated user, allowing them to track their submissions.
@@ -101,9 +241,58 @@ Description: Displays all toy drawings uploaded by the currently authenticated u
 
 @login_required
 def track_drawings(request):
-    drawings = ToyDrawing.objects.filter(user=request.user)
+    # The full description and special instructions are only needed on the edit page
+    drawings = (ToyDrawing.objects.filter(user=request.user)
+                .defer('description', 'special_instructions')
+                .annotate(description_preview=Substr('description', 1, 300)))
+    last_change = DrawingStatusChange.objects.filter(user=request.user).order_by('-id').values_list('id', flat=True).first()
+
+    context = drawing_history(request, drawings)
+    context['last_change'] = last_change or 0
+    return render(request, 'toys/track_drawings.html', context)
+
+
+def drawing_history(request, drawings):
+    """Filter drawings by the `status` query parameter and return one keyset page of them, newest first."""
+    status = request.GET.get('status', '')
+    if status in dict(STATUS_CHOICES):
+        drawings = drawings.filter(status=status)
+    else:
+        status = ''
+
+    page, next_cursor = keyset_page(drawings, request.GET.get('before'), settings.DRAWINGS_PER_PAGE)
+    return {'drawings': page, 'status': status, 'status_choices': STATUS_CHOICES, 'next_cursor': next_cursor}
+
+
+"""
+View: drawing_status_events
+Description: Server-Sent Events stream of status changes to the current user's drawings, read from the status change log, 
+so the track drawings page updates live instead of being reloaded. The stream closes after DRAWING_EVENTS_MAX_SECONDS 
+and the browser reconnects with Last-Event-ID. Serve it under ASGI (`gunicorn -c gunicorn.conf.py toyproject.asgi:application`); 
+under WSGI, e.g. `manage.py runserver`, it answers each request with the changes so far and the browser polls.
+"""
 
-    return render(request, 'toys/track_drawings.html', {'drawings': drawings})
+
+async def drawing_status_events(request):
+    if request.method != 'GET':
+        return HttpResponse(status=405, headers={'Allow': 'GET'})
+    # request.user is lazy and loads from the database, which must not happen on the event loop
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return HttpResponse(status=401)
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('after', ''))
+    except ValueError:
+        latest = await DrawingStatusChange.objects.filter(user=user).order_by('-id').values_list('id', flat=True).afirst()
+        last_id = latest or 0
+
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server would buffer the whole stream, holding a worker for DRAWING_EVENTS_MAX_SECONDS
+        return HttpResponse(await poll_status_events(user, last_id), content_type='text/event-stream',
+                            headers={'Cache-Control': 'no-cache'})
+    return StreamingHttpResponse(status_events(user, last_id), content_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 """
@@ -121,8 +310,7 @@ def edit_drawing(request, id):
     if request.method == 'POST':
         form = ToyDrawingForm(request.POST, request.FILES,
                               instance=drawing)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and save_drawing(request, form, form.save(commit=False)):
             return redirect('track_drawings')
     else:
         form = ToyDrawingForm(instance=drawing)
@@ -133,95 +321,141 @@ def edit_drawing(request, id):
 """
 View: view_cart
 Description: Displays the contents of the user's shopping cart. It calculates the subtotal and total price of all items in the cart 
-and displays them to the user.
+and displays them to the user. Anonymous visitors see the cart stored in their signed cart cookie.
 """
 
 
-@login_required
 def view_cart(request):
-    cart = Cart.objects.get(user=request.user)
+    if request.user.is_authenticated:
+        cart = list(CartItem.objects.filter(cart__user=request.user).prefetch_related('item'))
+        lines = [(cart_item.item, cart_item.quantity) for cart_item in cart]
+        keys = [(cart_item.content_type_id, cart_item.object_id) for cart_item in cart]
+    else:
+        guest_lines = read_guest_cart(request)
+        lines = guest_cart_items(guest_lines)
+        content_types = ContentType.objects.get_for_models(*CART_ITEM_TYPES.values())
+        keys = [(content_types[CART_ITEM_TYPES[item_type]].id, item_id) for item_type, item_id in guest_lines]
 
     cart_items = []
     total_price = 0
 
-    for cart_item in cart.cartitem_set.all():
-        item = cart_item.item
-
-        subtotal = item.price * cart_item.quantity
+    for item, quantity in lines:
+        subtotal = item.price * quantity
         total_price += subtotal
 
         cart_items.append({
             'item': item,
-            'quantity': cart_item.quantity,
+            'quantity': quantity,
             'price': item.price,
             'subtotal': subtotal,
         })
 
     return render(request, 'toys/view_cart.html', {
         'cart_items': cart_items,
-        'total_price': total_price
+        'total_price': total_price,
+        'recommended': recommendations(keys, settings.RECOMMENDATIONS_SHOWN),
     })
 
 
 """
 View: add_to_cart
 Description: Adds an item (toy, accessory, or drawing) to the user's cart. It checks the item type and quantity, 
-then adds the appropriate item to the user's cart. If the item already exists in the cart, the quantity is updated.
+then adds the appropriate item to the user's cart. If the item already exists in the cart, the quantity is updated. 
+Anonymous visitors can add toys and accessories to a signed cookie cart, which is merged into their cart at login.
 """
 
 
-@login_required
 def add_to_cart(request, item_id, item_type):
-    if item_type == 'toy':
-        model = Toy
-    elif item_type == 'accessory':
-        model = Accessory
-    elif item_type == 'drawing':
-        model = ToyDrawing
-    else:
+    model = CART_ITEM_TYPES.get(item_type)
+    if model is None:
         return redirect('toy_list')
 
+    if not request.user.is_authenticated:
+        if item_type not in GUEST_ITEM_CODES:
+            return redirect_to_login(request.get_full_path())
+        get_object_or_404(model, id=item_id)
+        try:
+            lines = add_to_guest_cart(read_guest_cart(request), item_type, item_id)
+        except GuestCartFull:
+            return redirect_to_login(request.get_full_path())
+        return write_guest_cart(redirect('view_cart'), lines)
+
     content_type = ContentType.objects.get_for_model(model)
 
-    item = get_object_or_404(model, id=item_id)
+    # Drawings are private to their owner
+    item = get_object_or_404(model, id=item_id, **({'user': request.user} if item_type == 'drawing' else {}))
 
     cart, created = Cart.objects.get_or_create(user=request.user)
 
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        content_type=content_type,
-        object_id=item.id
-    )
-
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    # Single INSERT ... ON CONFLICT DO UPDATE, so concurrent clicks all count
+    add_cart_items(cart, [(content_type.id, item.id, 1)])
 
     return redirect('view_cart')
 
 
+"""
+View: cart_api
+Description: JSON cart endpoint. Applies a batch of operations, `{"operations": [{"op": "add" | "set" | "remove", 
+"type": "toy" | "accessory" | "drawing", "id": ..., "quantity": ...}, ...]}`, in one transaction and returns the changed 
+lines and the new cart totals. Requests carrying an `Idempotency-Key` header are applied at most once.
+"""
+
+
+@require_POST
+def cart_api(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': "Log in to use the cart API."}, status=401)
+
+    key = request.headers.get('Idempotency-Key', '')
+    if len(key) > 64:
+        return JsonResponse({'error': "Idempotency-Key must be at most 64 characters."}, status=400)
+    try:
+        operations = parse_operations(json.loads(request.body).get('operations'))
+        response = run_cart_request(request.user, operations, key or None)
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': "Expected a JSON object with an 'operations' list."}, status=400)
+    except CartError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(response)
+
+
 """
 View: toy_list
-Description: Displays a list of all toys available in the store. Retrieves all `Toy` objects and renders them on the toy listing page.
+Description: Displays the toys in the store, optionally filtered by price band, stock, minimum rating and whether they
+have accessories. Filters and facet counts come from the in-memory facet index (toys/facets.py), so besides the one
+loading the toys shown, the only query reads the facets sequence to check that the index is current.
 """
 
 
 def toy_list(request):
+    index = get_facet_index()
+    selected = selected_facets(request.GET)
     toys = Toy.objects.all()
-    return render(request, 'toys/toy_list.html', {'toys': toys})
+    if selected:
+        toys = toys.filter(id__in=index.matching(selected))
+    return render(request, 'toys/toy_list.html', {
+        'toys': toys,
+        'facets': index.facets(selected),
+        'filtered': bool(selected),
+    })
 
 
 """
 View: toy_details
 Description: Displays the details of a specific toy, including its accessories and customer reviews. 
-It also handles review submission for authenticated users.
+It also handles review submission for authenticated users. The toy, its accessories and review summary come from the
+two-tier catalog cache.
 """
 
 
+@rate_limit('review')
 def toy_details(request, id):
-    toy = get_object_or_404(Toy, id=id)
-    accessories = toy.accessories.all()
-    reviews = toy.reviews.all()
+    toy = get_toy(id)
+    if toy is None:
+        raise Http404("No toy matches the given query.")
+    accessories = get_accessories(toy.id)
+    reviews = toy.reviews.select_related('user')
 
     if request.method == 'POST':
         if request.user.is_authenticated:
@@ -239,11 +473,16 @@ def toy_details(request, id):
     else:
         form = ReviewForm()
 
+    toy_type = ContentType.objects.get_for_model(Toy)
+    recommended = recommendations([(toy_type.id, toy.id)], settings.RECOMMENDATIONS_SHOWN)
+
     return render(request, 'toys/toy_details.html', {
         'toy': toy,
         'accessories': accessories,
         'reviews': reviews,
-        'form': form
+        'review_summary': get_review_summary(toy.id),
+        'form': form,
+        'recommended': recommended,
     })
 
 
@@ -294,12 +533,16 @@ and saves the updated cart item.
 
 @login_required
 def update_cart(request, item_id, action):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+    cart_items = CartItem.objects.filter(id=item_id, cart__user=request.user)
+    # F() updates are applied by the database, so concurrent clicks cannot overwrite each other
     if action == 1:
-        cart_item.quantity += 1
-    elif action == 0 and cart_item.quantity > 1:
-        cart_item.quantity -= 1
-    cart_item.save()
+        updated = cart_items.filter(quantity__lt=settings.CART_MAX_QUANTITY).update(quantity=F('quantity') + 1)
+    elif action == 0:
+        updated = cart_items.filter(quantity__gt=1).update(quantity=F('quantity') - 1)
+    else:
+        updated = 0
+    if not updated and not cart_items.exists():
+        raise Http404
     return redirect('view_cart')
 
 
@@ -318,22 +561,26 @@ def remove_from_cart(request, item_id):
 
 """
 View: user_profile
-Description: Displays the user's profile, including their uploaded toy drawings and any orders (if applicable). 
-Fetches the user profile, creating one if it does not exist, and renders the profile page with the relevant data.
+Description: Displays the user's profile, including their uploaded toy drawings and their order history, paged newest first 
+with each order's line items. Fetches the user profile, creating one if it does not exist, and renders the profile page 
+with the relevant data.
 """
 
 
 @login_required
 def user_profile(request):
     profile, created = UserProfile.objects.get_or_create(user=request.user)
-    drawings = ToyDrawing.objects.filter(user=request.user)
+    drawings = ToyDrawing.objects.filter(user=request.user).only('id', 'name', 'status', 'created_at')
 
-    orders = []
+    # One query for the page of orders and one for all of their lines
+    orders, next_orders_cursor = keyset_page(Order.objects.filter(user=request.user).prefetch_related('lines'),
+                                             request.GET.get('orders_before'), settings.ORDERS_PER_PAGE)
 
     return render(request, 'toys/user_profile.html', {
         'profile': profile,
-        'drawings': drawings,
-        'orders': orders
+        'orders': orders,
+        'next_orders_cursor': next_orders_cursor,
+        **drawing_history(request, drawings),
     })
 
 
@@ -370,7 +617,7 @@ def checkout(request):
 
     cart_items = []
     total_price = 0
-    for cart_item in cart.cartitem_set.all():
+    for cart_item in cart.cartitem_set.prefetch_related('item'):
         subtotal = cart_item.item.price * cart_item.quantity
         total_price += subtotal
         cart_items.append({
@@ -385,21 +632,38 @@ def checkout(request):
 
 """
 View: payment
-Description: Initiates the payment process using Stripe for the most recent order. It creates a checkout session with Stripe 
-and redirects the user to Stripe's payment page.
+Description: Initiates the payment process using Stripe. Submitting the checkout page turns the cart into an order first; 
+otherwise the most recent order is paid. It creates a checkout session with one Stripe line per order line 
+and redirects the user to Stripe's payment page. If Stripe fails, an order placed by this request goes back into the cart.
 """
 
 
 @login_required
+@rate_limit('payment', methods=('GET', 'POST'))
 def payment(request):
-    order = Order.objects.filter(user=request.user).order_by('-created_at').first()
+    order = placed = place_order(request.user) if request.method == 'POST' else None
+    if not order:
+        order = Order.objects.filter(user=request.user).order_by('-created_at').first()
 
     if not order:
         return redirect('checkout')
 
-    session = stripe.checkout.Session.create(
-        payment_method_types=['card'],
-        line_items=[
+    line_items = [
+        {
+            'price_data': {
+                'currency': 'usd',
+                'product_data': {
+                    'name': line.name,
+                },
+                'unit_amount': int(line.unit_price * 100),
+            },
+            'quantity': line.quantity,
+        }
+        for line in order.lines.all()
+    ]
+    if not line_items:
+        # Orders placed before line items were recorded
+        line_items = [
             {
                 'price_data': {
                     'currency': 'usd',
@@ -410,13 +674,25 @@ def payment(request):
                 },
                 'quantity': 1,
             },
-        ],
-        mode='payment',
-        success_url=request.build_absolute_uri('/payment/success/'),
-        cancel_url=request.build_absolute_uri('/payment/cancel/'),
-    )
+        ]
+
+    # Not in the order's transaction: that would hold the database write lock while Stripe answers
+    try:
+        session = get_stripe().checkout.Session.create(
+            payment_method_types=['card'],
+            line_items=line_items,
+            mode='payment',
+            success_url=request.build_absolute_uri('/payment/success/'),
+            cancel_url=request.build_absolute_uri(f'/payment/cancel/?order={order.id}'),
+        )
+    except Exception:
+        if placed:
+            restore_cart(request.user, placed.id)
+        raise
 
-    return redirect(session.url, code=303)
+    response = redirect(session.url)
+    response.status_code = 303  # redirect() has no status argument
+    return response
 
 
 """
@@ -432,12 +708,16 @@ def payment_success(request):
 
 """
 View: payment_cancel
-Description: Displays a cancellation message if the user cancels the payment process. Redirects to the cancellation page.
+Description: Displays a cancellation message if the user cancels the payment process. The unpaid order named in the 
+cancel URL is moved back into the cart, so the customer can change it and check out again.
 """
 
 
 @login_required
 def payment_cancel(request):
+    order_id = request.GET.get('order', '')
+    if order_id.isdigit():
+        restore_cart(request.user, int(order_id))
     return render(request, 'toys/payment_cancel.html')
 
 
@@ -454,3 +734,48 @@ def review_detail(request, review_id):
     user_name = review.user.get_full_name() or review.user.username  # Use get_full_name or fallback to username
 
     return render(request, 'toys/review_detail.html', {'review': review, 'user_name': user_name})
+
+
+
+"""
+View: protected_media
+Description: Serves an uploaded drawing image only to the user who uploaded it or to staff. The file transfer itself is 
+handed to the front proxy (X-Accel-Redirect / X-Sendfile) when configured, otherwise streamed with Range support.
+"""
+
+
+@login_required
+def protected_media(request, path):
+    name = 'customer_drawings/' + path
+    drawings = ToyDrawing.objects.filter(image=name)
+    if not request.user.is_staff:
+        drawings = drawings.filter(user=request.user)
+    if not drawings.exists():
+        raise Http404
+    return send_media(request, name)
+
+
+"""
+View: public_media
+Description: Serves public catalog images (toys, accessories, reviews). It never touches the session or the database, 
+so in production the proxy can serve the same files directly from MEDIA_ROOT.
+"""
+
+
+def public_media(request, path):
+    if path.split('/', 1)[0] not in settings.MEDIA_PUBLIC_DIRS:
+        raise Http404
+    return send_media(request, path, public=True)
+
+
+"""
+View: readiness
+Description: Readiness probe for the load balancer. Returns 200 once this worker has been warmed up (see toys/warmup.py)
+and 503 until then. It reads neither the session nor the database.
+"""
+
+
+def readiness(request):
+    if not warmup.is_warm():
+        return JsonResponse({'ready': False}, status=503)
+    return JsonResponse({'ready': True, 'warm_up_ms': round(warmup.warmed_up_in * 1000)})
@@ -0,0 +1,101 @@
+"""
+Worker warm-up.
+
+``warm_up`` does the work the first request of a fresh worker would
+otherwise pay for: compiling every project template into the cached loader,
+populating the URL resolver and compiling each pattern's regex, and loading
+the catalog ContentTypes into their cache. WarmUpMiddleware runs it when
+Django loads its middleware, i.e. when the WSGI or ASGI application is
+created, under gunicorn, uvicorn or runserver alike; with gunicorn's
+``preload_app`` that happens once in the master, so forked workers start
+warm. The readiness endpoint reports ready only after it has completed, and
+each process logs the time from the start of warm-up to its first response.
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import URLResolver, get_resolver
+
+from .cart import CART_ITEM_TYPES
+
+logger = logging.getLogger(__name__)
+
+# perf_counter() when warm-up started, and the seconds it took (None until it completed)
+started_at = None
+warmed_up_in = None
+# Whether this process has logged its first response (a preloading master never does)
+first_response_logged = False
+
+
+def is_warm():
+    return warmed_up_in is not None
+
+
+def project_templates():
+    """Names of the templates in the project template dirs and the toys app."""
+    dirs = [directory for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+    dirs.append(os.path.join(apps.get_app_config('toys').path, 'templates'))
+    names = set()
+    for directory in dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt')):
+                    names.add(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def compile_url_patterns(resolver):
+    count = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # compiled on first access
+        count += 1
+        if isinstance(pattern, URLResolver):
+            count += compile_url_patterns(pattern)
+    return count
+
+
+def warm_up():
+    """Warm this process's caches; returns the number of templates, URL patterns and content types loaded."""
+    global started_at, warmed_up_in
+    started_at = start = time.perf_counter()
+
+    templates = 0
+    for name in project_templates():
+        try:
+            get_template(name)
+            templates += 1
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            logger.warning("Could not precompile template %s", name, exc_info=True)
+
+    resolver = get_resolver()
+    resolver.reverse_dict  # populates the reverse lookup tables
+    patterns = compile_url_patterns(resolver)
+
+    try:
+        content_types = len(ContentType.objects.get_for_models(*CART_ITEM_TYPES.values()))
+    except DatabaseError:
+        # e.g. runserver before migrate: requests will load them instead
+        logger.warning("Could not load content types", exc_info=True)
+        content_types = 0
+
+    warmed_up_in = time.perf_counter() - start
+    logger.info("Warmed up %d templates, %d URL patterns and %d content types in %.0f ms",
+                templates, patterns, content_types, warmed_up_in * 1000)
+    return templates, patterns, content_types
+
+
+def log_first_response(request):
+    """Log how long after warm-up started this process answered its first request."""
+    global first_response_logged
+    if first_response_logged or started_at is None:
+        return
+    first_response_logged = True
+    logger.info("Process %s answered its first request (%s %s) %.1f ms after warm-up started", os.getpid(),
+                request.method, request.path, (time.perf_counter() - started_at) * 1000)